@@ -5,14 +5,56 @@
 负责读取和保存应用程序配置
 """
 
+import atexit
+import functools
 import json
 import os
 import sys
+import threading
 # 修改导入方式，使用绝对导入
 from utils.logger import get_logger
 
+# orjson为可选依赖，可用时用于加速配置文件的读写，否则回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = get_logger(__name__)
 
+# 配置变更后延迟写盘的静默时间（秒），期间的多次修改合并为一次写入
+_FLUSH_DELAY = 0.5
+
+
+def _dumps_config(config):
+    """
+    将配置字典序列化为UTF-8字节串
+    
+    Args:
+        config: 配置字典
+        
+    Returns:
+        bytes: 序列化后的配置内容
+    """
+    if orjson is not None:
+        return orjson.dumps(config, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(config, indent=4, ensure_ascii=False).encode("utf-8")
+
+
+def _loads_config(data):
+    """
+    将配置文件内容反序列化为配置字典
+    
+    Args:
+        data: 配置文件的原始字节内容
+        
+    Returns:
+        dict: 配置字典
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 class ConfigManager:
     """
@@ -35,7 +77,19 @@ class ConfigManager:
             base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         
         self.config_file = os.path.join(base_path, config_file)
+        # 最近一次成功写入磁盘的序列化内容，用于跳过无变化的写入
+        self._last_serialized = None
+        # 延迟写盘状态：修改配置只标记为脏，由定时器或flush统一写入
+        self._dirty = False
+        self._flush_timer = None
+        self._flush_lock = threading.Lock()
         self.config = self._load_config()
+        # 配置版本号，每次修改配置时递增，供调用方判断依赖配置的缓存是否失效
+        self.version = 0
+        # 按源目录缓存输出目录的路径计算结果；目录是否存在不缓存，每次获取时重新确认
+        self._resolve_output_dir = functools.lru_cache(maxsize=256)(self._resolve_output_dir_uncached)
+        # 程序退出前确保未写入的配置被保存；主程序退出时会先显式调用flush，这里只作为兜底
+        atexit.register(self._flush_if_dirty)
     
     def _load_config(self):
         """
@@ -52,24 +106,27 @@ class ConfigManager:
             "crf": 18,
             "audio_codec": "aac",
             "audio_bitrate": "128k",
-            "threads": 4,
+            "threads": 4,  # 每个FFmpeg进程的编码线程数，0表示由FFmpeg自动选择
             "overwrite": False,
+            "use_gpu": False,
+            "low_latency": False,  # 高级选项：使用-tune zerolatency
+            "fixed_gop": False,  # 高级选项：固定25帧关键帧间隔并关闭场景切换检测
+            "x264_preset": "veryfast",  # libx264编码预设，比fast快约40%，文件大小几乎不变
+            "remux_only": False,  # 只转封装不重新编码，视频流原样复制到MP4
+            "input_fps": 0,  # 输入裸流的帧率，0表示自动（裸流无帧率信息时FFmpeg按25fps处理）
+            "use_pyav": False,  # 已安装PyAV时，小于50MB的文件在进程内转码
             "keep_original": True,
             "log_level": "INFO"
         }
         
         try:
             if os.path.exists(self.config_file):
-                with open(self.config_file, "r", encoding="utf-8") as f:
-                    config = json.load(f)
+                with open(self.config_file, "rb") as f:
+                    config = _loads_config(f.read())
                 logger.info(f"成功加载配置文件: {self.config_file}")
                 
-                # 合并默认配置和文件配置，确保所有配置项都存在
-                for key, value in default_config.items():
-                    if key not in config:
-                        config[key] = value
-                
-                return config
+                # 合并默认配置和文件配置，确保所有配置项都存在（文件中的值优先）
+                return {**default_config, **config}
             else:
                 logger.warning(f"配置文件不存在，使用默认配置: {self.config_file}")
                 self._save_config(default_config)
@@ -86,8 +143,17 @@ class ConfigManager:
             config: 要保存的配置字典
         """
         try:
-            with open(self.config_file, "w", encoding="utf-8") as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
+            data = _dumps_config(config)
+            # 内容与上次写入一致时直接跳过，减少不必要的磁盘写入
+            if data == self._last_serialized:
+                return
+            
+            # 先写入临时文件再替换，保证配置文件不会因中途失败而损坏
+            tmp_file = self.config_file + ".tmp"
+            with open(tmp_file, "wb") as f:
+                f.write(data)
+            os.replace(tmp_file, self.config_file)
+            self._last_serialized = data
             logger.info(f"成功保存配置文件: {self.config_file}")
         except Exception as e:
             logger.error(f"保存配置文件失败: {e}")
@@ -115,12 +181,75 @@ class ConfigManager:
             value: 配置项值
         """
         self.config[key] = value
-        self._save_config(self.config)
+        self.version += 1
+        if key == "output_dir":
+            self._resolve_output_dir.cache_clear()
+        self._schedule_flush()
         logger.info(f"更新配置: {key} = {value}")
     
+    def set_configs(self, values):
+        """
+        批量设置配置值，只写入一次配置文件
+        
+        Args:
+            values: 配置项名称到配置项值的字典
+        """
+        self.config.update(values)
+        self.version += 1
+        if "output_dir" in values:
+            self._resolve_output_dir.cache_clear()
+        self._schedule_flush()
+        logger.info(f"批量更新配置: {values}")
+    
+    def _schedule_flush(self):
+        """
+        标记配置为脏并重新启动延迟写盘定时器
+        """
+        with self._flush_lock:
+            self._dirty = True
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+            self._flush_timer = threading.Timer(_FLUSH_DELAY, self._flush_if_dirty)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def _flush_if_dirty(self):
+        """
+        如果配置有未保存的修改，则写入配置文件
+        """
+        with self._flush_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._save_config(self.config)
+    
+    def flush(self):
+        """
+        立即将未保存的配置写入配置文件，供需要同步持久化的调用方使用
+        """
+        self._flush_if_dirty()
+    
     def get_output_dir(self, source_dir):
         """
-        获取输出目录路径
+        获取输出目录路径并确保目录存在，每次开始转码时调用一次
+        
+        Args:
+            source_dir: 源目录路径
+            
+        Returns:
+            str: 输出目录路径
+        """
+        output_dir = self._resolve_output_dir(source_dir)
+        # 每次都确认目录存在，两次转码之间用户删除或移动了输出目录时会重新创建
+        os.makedirs(output_dir, exist_ok=True)
+        return output_dir
+    
+    def _resolve_output_dir_uncached(self, source_dir):
+        """
+        解析输出目录路径，只进行路径计算，结果由get_output_dir缓存
         
         Args:
             source_dir: 源目录路径
@@ -135,11 +264,15 @@ class ConfigManager:
             output_dir = os.path.join(source_dir, output_dir)
         
         # 标准化路径，确保使用统一的分隔符（Windows使用反斜杠）
-        output_dir = os.path.normpath(output_dir)
-        
-        # 确保输出目录存在
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            logger.info(f"创建输出目录: {output_dir}")
-        
-        return output_dir
\ No newline at end of file
+        return os.path.normpath(output_dir)
+
+
+@functools.lru_cache(maxsize=1)
+def get_config_manager():
+    """
+    获取进程内共享的配置管理器，首次调用时加载配置文件，之后返回同一实例
+    
+    Returns:
+        ConfigManager: 配置管理器实例
+    """
+    return ConfigManager()
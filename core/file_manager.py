@@ -7,11 +7,39 @@
 
 import os
 import re
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+# 文件名时间戳匹配模式，如：0-102042.v264，提取102042；模块级预编译避免每次调用重复查找缓存
+_TS_RE = re.compile(r"\d+-(\d+)\.v264$")
+
+# 无法从文件名中提取时间戳时使用的排序哨兵值
+_NO_TIMESTAMP = -1
+
+# 并行扫描顶层子目录的最大线程数，保持较小以免在机械硬盘上造成磁头争用
+_SCAN_WORKERS = 8
+
+
+def _get_timestamp(file_name):
+    """
+    从文件名中提取时间戳
+    
+    Args:
+        file_name: 文件名（不包含路径）
+        
+    Returns:
+        int: 提取的时间戳，若无法提取则返回_NO_TIMESTAMP
+    """
+    match = _TS_RE.match(file_name)
+    return int(match.group(1)) if match else _NO_TIMESTAMP
+
+
 class FileManager:
     """
     文件管理类，用于处理视频文件的扫描、筛选和排序
@@ -22,6 +50,8 @@ class FileManager:
         初始化文件管理器
         """
         self.video_files = []
+        # 与video_files一一对应的文件名，排序时从扫描结果中一并保留，调用方无需再调用basename
+        self.file_names = []
     
     def scan_directory(self, directory, file_extension=".v264"):
         """
@@ -36,16 +66,13 @@ class FileManager:
         """
         logger.info(f"开始扫描目录: {directory}")
         self.video_files = []
+        self.file_names = []
         
         try:
-            # 遍历目录下的所有文件
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    # 筛选指定扩展名的文件
-                    if file.lower().endswith(file_extension):
-                        file_path = os.path.join(root, file)
-                        self.video_files.append(file_path)
-                        logger.debug(f"找到文件: {file_path}")
+            # 使用os.scandir遍历目录树，避免os.walk为每个目录额外调用stat
+            for path, name in self._iter_files_parallel(directory, file_extension):
+                self.video_files.append(path)
+                self.file_names.append(name)
             
             logger.info(f"扫描完成，共找到 {len(self.video_files)} 个{file_extension}文件")
             return self.video_files
@@ -53,41 +80,135 @@ class FileManager:
             logger.error(f"扫描目录失败: {e}")
             return []
     
-    def sort_files_by_timestamp(self):
+    def iter_files(self, directory, file_extension=".v264"):
+        """
+        惰性扫描指定目录，边遍历边产出文件路径及其时间戳，不构建中间列表
+        
+        Args:
+            directory: 要扫描的目录路径
+            file_extension: 要筛选的文件扩展名，默认为.v264
+            
+        Yields:
+            tuple: (文件路径, 文件名, 时间戳)，文件名来自DirEntry，时间戳在扫描时一次性提取
+        """
+        try:
+            for path, name in self._iter_files_parallel(directory, file_extension):
+                yield path, name, _get_timestamp(name)
+        except Exception as e:
+            logger.error(f"扫描目录失败: {e}")
+    
+    def _iter_files_parallel(self, directory, ext):
+        """
+        并行遍历目录树：根目录下的文件直接产出，每个顶层子目录交给线程池分别遍历
+        
+        Args:
+            directory: 要遍历的根目录
+            ext: 要筛选的文件扩展名
+            
+        Yields:
+            tuple: (文件路径, 文件名)，根目录的文件在前，子目录按发现顺序依次产出，多次扫描结果顺序一致
+        """
+        subdirs = []
+        yield from self._iter_files(directory, ext, subdirs)
+        if not subdirs:
+            return
+        
+        workers = min(_SCAN_WORKERS, os.cpu_count() or 1, len(subdirs))
+        if workers == 1:
+            for subdir in subdirs:
+                yield from self._collect_files(subdir, ext)
+            return
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._collect_files, subdir, ext) for subdir in subdirs]
+            # 按提交顺序而非完成顺序取结果，时间戳相同的文件在排序后的相对顺序每次扫描都一致
+            for future in futures:
+                yield from future.result()
+    
+    def _collect_files(self, root, ext):
+        """
+        遍历一个子目录树并返回匹配的文件列表，无法访问的子目录记录警告后跳过
+        
+        Args:
+            root: 要遍历的子目录
+            ext: 要筛选的文件扩展名
+            
+        Returns:
+            list: 匹配的(文件路径, 文件名)列表
+        """
+        try:
+            return list(self._iter_files(root, ext))
+        except OSError as e:
+            logger.warning(f"无法访问目录，已跳过: {root}, {e}")
+            return []
+    
+    def _iter_files(self, root, ext, subdirs=None):
+        """
+        基于os.scandir和显式栈遍历目录树，逐个产出匹配扩展名的文件路径
+        
+        Args:
+            root: 要遍历的根目录
+            ext: 要筛选的文件扩展名
+            subdirs: 可选列表，提供时只扫描根目录本身，其下的子目录收集到该列表中而不递归
+            
+        Yields:
+            tuple: (文件路径, 文件名)
+        """
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        # 预先构建大小写变体的后缀元组，endswith一次C级比较即可完成，无需为每个文件名创建小写副本
+        # 对.v264这类只含一个字母的扩展名，该元组覆盖了所有大小写组合
+        suffixes = tuple({ext, ext.upper(), ext.lower()})
+        pending = deque([root])
+        # 只扫描根目录时，子目录放入调用方提供的列表，否则压栈继续遍历
+        dir_sink = pending if subdirs is None else subdirs
+        while pending:
+            current = pending.pop()
+            try:
+                it = os.scandir(current)
+            except OSError as e:
+                # 与os.walk保持一致，无法访问的子目录直接跳过
+                if current == root:
+                    raise
+                logger.warning(f"无法访问目录，已跳过: {current}, {e}")
+                continue
+            with it:
+                for entry in it:
+                    # 先做廉价的字符串判断，再使用DirEntry缓存的类型信息
+                    if entry.name.endswith(suffixes) and entry.is_file(follow_symlinks=False):
+                        if debug_enabled:
+                            logger.debug("找到文件: %s", entry.path)
+                        yield entry.path, entry.name
+                    elif entry.is_dir(follow_symlinks=False):
+                        dir_sink.append(entry.path)
+    
+    def sort_files_by_timestamp(self, files=None):
         """
         按照文件名中的时间戳对文件进行排序
         文件名格式如：0-102042.v264，其中102042为时间戳
         
+        Args:
+            files: 可选的(文件路径, 文件名, 时间戳)可迭代对象，如iter_files的返回值；
+                   为None时对当前文件列表排序
+        
         Returns:
             list: 按时间戳排序后的文件列表
         """
         logger.info("开始按时间戳排序文件")
         
-        def get_timestamp(file_path):
-            """
-            从文件名中提取时间戳
-            
-            Args:
-                file_path: 文件路径
-                
-            Returns:
-                int: 提取的时间戳，若无法提取则返回0
-            """
-            # 获取文件名（不包含路径）
-            file_name = os.path.basename(file_path)
-            
-            # 使用正则表达式提取时间戳
-            # 匹配格式如：0-102042.v264，提取102042
-            match = re.match(r"\d+-(\d+)\.v264", file_name)
-            if match:
-                return int(match.group(1))
-            else:
-                logger.warning(f"无法从文件名中提取时间戳: {file_name}")
-                return 0
-        
-        # 按时间戳排序文件列表
-        sorted_files = sorted(self.video_files, key=get_timestamp)
-        self.video_files = sorted_files
+        if files is None:
+            names = map(os.path.basename, self.video_files)
+            files = ((path, name, _get_timestamp(name)) for path, name in zip(self.video_files, names))
+        
+        # 先装饰再排序：直接使用扫描时预先提取的时间戳，排序中不再调用正则或basename
+        # 排序本身需要完整缓冲，这是唯一物化结果的地方
+        keyed = sorted(files, key=itemgetter(2))
+        self.video_files = [path for path, _, _ in keyed]
+        self.file_names = [name for _, name, _ in keyed]
+        
+        # 汇总记录无法解析的文件，避免在排序键函数中逐个记录日志
+        unparsed_count = sum(1 for _, _, ts in keyed if ts == _NO_TIMESTAMP)
+        if unparsed_count:
+            logger.warning(f"有 {unparsed_count} 个文件无法从文件名中提取时间戳，已排在最前")
         
         logger.info(f"文件排序完成，共 {len(self.video_files)} 个文件")
         return self.video_files
@@ -114,8 +235,9 @@ class FileManager:
         if filter_func is None:
             return self.video_files
         
-        filtered_files = [file for file in self.video_files if filter_func(file)]
-        self.video_files = filtered_files
+        kept = [(file, name) for file, name in zip(self.video_files, self.file_names) if filter_func(file)]
+        self.video_files = [file for file, _ in kept]
+        self.file_names = [name for _, name in kept]
         return self.video_files
     
     def clear_file_list(self):
@@ -123,4 +245,5 @@ class FileManager:
         清空当前的文件列表
         """
         self.video_files = []
+        self.file_names = []
         logger.info("文件列表已清空")
@@ -6,41 +6,156 @@
 """
 
 import os
+import random
 import threading
-import queue
-from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, deque, namedtuple
 # 修改导入方式，使用绝对导入
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 任务计数快照：总数、已完成、失败、已取消
+TaskCounts = namedtuple("TaskCounts", ("total", "completed", "failed", "cancelled"))
+
+
+class Task:
+    """
+    转码任务类，使用__slots__固定属性布局，比字典更省内存且属性访问更快
+    """
+    
+    __slots__ = ("input_file", "output_file", "include_audio", "status", "progress", "error_msg", "filename")
+    
+    def __init__(self, input_file, output_file, include_audio=False):
+        """
+        初始化转码任务
+        
+        Args:
+            input_file: 输入文件路径
+            output_file: 输出文件路径
+            include_audio: 是否包含音频处理，默认为False
+        """
+        self.input_file = input_file
+        self.output_file = output_file
+        self.include_audio = include_audio
+        self.status = "waiting"  # waiting, running, completed, failed, cancelled
+        self.progress = 0.0
+        self.error_msg = ""
+        # 构造时缓存文件名，避免在转码和GUI更新中反复调用os.path.basename
+        self.filename = os.path.basename(input_file)
+    
+    def to_dict(self):
+        """
+        将任务转换为字典
+        
+        Returns:
+            dict: 任务信息字典
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
 
 class TaskManager:
     """
     任务管理类，用于管理转码任务队列和多线程处理
     """
     
-    def __init__(self, transcode_engine, max_workers=4):
+    def __init__(self, transcode_engine, max_workers=4, ffmpeg_threads=None):
         """
         初始化任务管理器
         
         Args:
             transcode_engine: 转码引擎实例
             max_workers: 最大工作线程数，默认为4
+            ffmpeg_threads: 每个FFmpeg进程使用的线程数，用于限制并发进程数，默认为None（不限制）
         """
         self.transcode_engine = transcode_engine
-        self.max_workers = max_workers
-        self.executor = None
+        self.max_workers = self._limit_workers(max_workers, ffmpeg_threads)
+        # 每个工作线程一个本地任务队列，空闲时从其他线程的队列中窃取任务，
+        # 文件大小不一导致耗时不均时也能保持各线程负载均衡
+        self._queues = []
+        # 本轮执行的停止信号，每次start时重新创建，旧一轮的工作线程不会误领新任务
+        self._stop_event = None
+        # 保护本地队列的入队和空闲等待，领取任务时不加锁
+        self._work_cond = threading.Condition()
+        self._workers = []
         self.tasks = []
         self.task_results = {}
         self.is_running = False
         self.is_paused = False
-        self.is_cancelled = False
-        self.completed_count = 0
+        # 取消信号，使用Event保证跨线程可见性
+        self._cancel_event = threading.Event()
+        # 各状态的任务数量直方图，随状态转换同步更新，使所有计数查询为O(1)
+        self._status_counts = self._new_status_counts()
         self.total_count = 0
+        # 保护任务状态转换和计数器
+        self._lock = threading.Lock()
         self.progress_callback = None
         self.completion_callback = None
     
+    @property
+    def is_cancelled(self):
+        """
+        任务是否已被取消
+        
+        Returns:
+            bool: 是否已取消
+        """
+        return self._cancel_event.is_set()
+    
+    @staticmethod
+    def _new_status_counts():
+        """
+        创建空的任务状态直方图
+        
+        Returns:
+            Counter: 各状态计数均为0的直方图
+        """
+        return Counter({"waiting": 0, "running": 0, "completed": 0, "failed": 0, "cancelled": 0})
+    
+    def _set_status(self, task, new_status):
+        """
+        转换任务状态并同步更新状态直方图，调用方需持有self._lock
+        
+        Args:
+            task: 要更新的任务
+            new_status: 新的任务状态
+        """
+        self._status_counts[task.status] -= 1
+        task.status = new_status
+        self._status_counts[new_status] += 1
+    
+    def _finished_count(self):
+        """
+        获取已结束（完成、失败或取消）的任务数量，调用方需持有self._lock
+        
+        Returns:
+            int: 已结束的任务数量
+        """
+        counts = self._status_counts
+        return counts["completed"] + counts["failed"] + counts["cancelled"]
+    
+    @staticmethod
+    def _limit_workers(max_workers, ffmpeg_threads):
+        """
+        根据CPU核心数和每个FFmpeg进程的线程数计算实际并发数，
+        使同时运行的FFmpeg线程总数不超过CPU核心数，避免过度订阅
+        
+        Args:
+            max_workers: 期望的最大工作线程数
+            ffmpeg_threads: 每个FFmpeg进程使用的线程数
+            
+        Returns:
+            int: 实际使用的工作线程数
+        """
+        cpu_count = os.cpu_count() or 1
+        if ffmpeg_threads and ffmpeg_threads > 0:
+            optimal = max(1, cpu_count // ffmpeg_threads)
+        else:
+            optimal = cpu_count
+        workers = max(1, min(max_workers, optimal))
+        if workers != max_workers:
+            logger.info(f"根据CPU核心数({cpu_count})调整并发转码数: {max_workers} -> {workers}")
+        return workers
+    
     def set_progress_callback(self, callback):
         """
         设置进度回调函数
@@ -68,28 +183,38 @@ class TaskManager:
             output_file: 输出文件路径
             include_audio: 是否包含音频处理，默认为False
         """
-        task = {
-            "input_file": input_file,
-            "output_file": output_file,
-            "include_audio": include_audio,
-            "status": "waiting",  # waiting, running, completed, failed, cancelled
-            "progress": 0.0,
-            "error_msg": ""
-        }
-        self.tasks.append(task)
-        logger.info(f"添加转码任务: {input_file} -> {output_file}, 音频处理: {include_audio}")
+        task = Task(input_file, output_file, include_audio)
+        with self._lock:
+            self.tasks.append(task)
+            self._status_counts["waiting"] += 1
+            # 运行中追加的任务直接进入队列，由空闲的工作线程领取
+            if self.is_running:
+                self.total_count += 1
+                self._push_tasks(range(len(self.tasks) - 1, len(self.tasks)))
+        # 批量添加时每个任务都会调用，使用DEBUG级别和延迟格式化，汇总信息由start记录
+        logger.debug("添加转码任务: %s -> %s, 音频处理: %s", input_file, output_file, include_audio)
     
     def add_tasks(self, task_list):
         """
         批量添加转码任务
         
         Args:
-            task_list: 任务列表，每个任务包含input_file、output_file和可选的include_audio
-        """
-        for task in task_list:
-            include_audio = task.get("include_audio", False)
-            self.add_task(task["input_file"], task["output_file"], include_audio)
-        logger.info(f"批量添加转码任务，共 {len(task_list)} 个任务")
+            task_list: 任务列表或生成器，每个任务包含input_file、output_file和可选的include_audio
+        """
+        # 一次性构建所有任务并在同一把锁内追加，只记录一条汇总日志
+        new_tasks = [
+            Task(task["input_file"], task["output_file"], task.get("include_audio", False))
+            for task in task_list
+        ]
+        with self._lock:
+            start_index = len(self.tasks)
+            self.tasks.extend(new_tasks)
+            self._status_counts["waiting"] += len(new_tasks)
+            # 运行中追加的任务直接进入队列，由空闲的工作线程领取
+            if self.is_running:
+                self.total_count += len(new_tasks)
+                self._push_tasks(range(start_index, len(self.tasks)))
+        logger.info(f"批量添加转码任务，共 {len(new_tasks)} 个任务")
     
     def _task_wrapper(self, task_index):
         """
@@ -99,13 +224,19 @@ class TaskManager:
             task_index: 任务索引
         """
         task = self.tasks[task_index]
-        input_file = task["input_file"]
-        output_file = task["output_file"]
-        include_audio = task.get("include_audio", False)
-        filename = os.path.basename(input_file)
+        input_file = task.input_file
+        output_file = task.output_file
+        include_audio = task.include_audio
+        filename = task.filename
         
-        # 更新任务状态为运行中
-        task["status"] = "running"
+        with self._lock:
+            # 取消后不再启动新的FFmpeg进程，队列中剩余的任务直接标记为已取消并跳过
+            if self._cancel_event.is_set() or task.status == "cancelled":
+                if task.status == "waiting":
+                    self._set_status(task, "cancelled")
+                return
+            # 更新任务状态为运行中
+            self._set_status(task, "running")
         # 立即通知GUI任务开始运行，进度为0%
         if self.progress_callback:
             self.progress_callback(filename, 0.0)
@@ -113,26 +244,101 @@ class TaskManager:
         # 执行转码任务
         success, error_msg = self.transcode_engine.transcode_file(input_file, output_file, include_audio=include_audio)
         
-        # 更新任务结果
+        # 更新任务结果，并在同一把锁内读取已结束的任务总数
+        with self._lock:
+            if success:
+                self._set_status(task, "completed")
+                task.progress = 100.0
+                task.error_msg = ""
+            else:
+                self._set_status(task, "failed")
+                task.error_msg = error_msg
+            all_finished = self._finished_count() == self.total_count
+        
         if success:
-            task["status"] = "completed"
-            task["progress"] = 100.0
-            task["error_msg"] = ""
-            self.completed_count += 1
             logger.info(f"任务完成: {input_file} -> {output_file}")
         else:
-            task["status"] = "failed"
-            task["error_msg"] = error_msg
             logger.error(f"任务失败: {input_file} -> {output_file}, {error_msg}")
         
         # 检查是否所有任务都已完成
-        if self.completed_count + self.get_failed_count() + self.get_cancelled_count() == self.total_count:
+        if all_finished:
             self.is_running = False
+            self._stop_workers()
             logger.info("所有转码任务已完成")
             # 调用完成回调函数
             if self.completion_callback:
                 self.completion_callback(self.task_results)
     
+    def _push_tasks(self, indices):
+        """
+        将运行中追加的任务放入当前最短的本地队列并唤醒空闲的工作线程，其他线程可从中窃取
+        
+        Args:
+            indices: 要追加的任务索引
+        """
+        with self._work_cond:
+            min(self._queues, key=len).extend(indices)
+            self._work_cond.notify_all()
+    
+    @staticmethod
+    def _take_task(queues, worker_id):
+        """
+        领取一个任务：先从自己队列的头部按时间顺序取，为空时从随机选择的其他队列尾部窃取；
+        deque两端的弹出在GIL下是原子操作，领取任务无需加锁，窃取者和队列所有者也很少争用同一端
+        
+        Args:
+            queues: 本轮执行的本地队列列表
+            worker_id: 当前工作线程的编号
+            
+        Returns:
+            int: 任务索引，所有队列都为空时返回None
+        """
+        try:
+            return queues[worker_id].popleft()
+        except IndexError:
+            pass
+        
+        count = len(queues)
+        start = random.randrange(count)
+        for offset in range(count):
+            try:
+                return queues[(start + offset) % count].pop()
+            except IndexError:
+                continue
+        return None
+    
+    def _worker_loop(self, worker_id, queues, stop_event):
+        """
+        工作线程主循环，领取任务索引并执行，所有队列都为空时等待新任务，收到停止信号后退出
+        
+        Args:
+            worker_id: 工作线程编号，即其本地队列在queues中的下标
+            queues: 本轮执行的本地队列列表
+            stop_event: 本轮执行的停止信号
+        """
+        while not self._cancel_event.is_set() and not stop_event.is_set():
+            task_index = self._take_task(queues, worker_id)
+            if task_index is None:
+                # 入队在同一把锁内进行，加锁后再检查一次，避免错过等待前追加的任务
+                with self._work_cond:
+                    if stop_event.is_set():
+                        break
+                    task_index = self._take_task(queues, worker_id)
+                    if task_index is None:
+                        self._work_cond.wait()
+                        continue
+            self._task_wrapper(task_index)
+    
+    def _stop_workers(self):
+        """
+        设置本轮执行的停止信号并唤醒所有等待中的工作线程，使其退出
+        """
+        if self._stop_event is None:
+            return
+        with self._work_cond:
+            self._stop_event.set()
+            self._work_cond.notify_all()
+    
     def start(self):
         """
         开始执行所有转码任务
@@ -150,19 +356,32 @@ class TaskManager:
         # 重置状态
         self.is_running = True
         self.is_paused = False
-        self.is_cancelled = False
-        self.completed_count = 0
+        self._cancel_event.clear()
+        # 每轮执行开始时重置一次共享转码引擎的暂停和取消状态，重试失败任务也经过这里
+        self.transcode_engine.reset()
         self.total_count = len(self.tasks)
+        # 所有任务重新参与本轮执行，状态重置为等待中，使计数与提交的任务一致
+        with self._lock:
+            for task in self.tasks:
+                if task.status != "waiting":
+                    self._set_status(task, "waiting")
         
-        # 创建线程池
-        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
-        
-        # 提交所有任务到线程池
-        for i in range(len(self.tasks)):
-            self.executor.submit(self._task_wrapper, i)
+        # 任务以索引形式按顺序分段放入各工作线程的本地队列，相邻文件通常位于同一目录，由同一线程依次处理
+        task_count = len(self.tasks)
+        workers = self.max_workers
+        self._queues = [
+            deque(range(task_count * i // workers, task_count * (i + 1) // workers))
+            for i in range(workers)
+        ]
+        self._stop_event = threading.Event()
         
-        # 关闭线程池，等待所有任务完成
-        self.executor.shutdown(wait=False)
+        # 启动固定数量的工作线程，从本地队列中领取任务，空闲时窃取其他线程的任务
+        self._workers = [
+            threading.Thread(target=self._worker_loop, args=(i, self._queues, self._stop_event), daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
     
     def pause(self):
         """
@@ -196,13 +415,17 @@ class TaskManager:
             logger.warning("转码任务没有在运行中")
             return
         
-        self.is_cancelled = True
+        self._cancel_event.set()
         self.transcode_engine.cancel()
         
         # 更新所有等待中的任务状态为已取消
-        for task in self.tasks:
-            if task["status"] == "waiting":
-                task["status"] = "cancelled"
+        with self._lock:
+            for task in self.tasks:
+                if task.status == "waiting":
+                    self._set_status(task, "cancelled")
+        
+        # 通知工作线程退出，队列中剩余的任务不再启动
+        self._stop_workers()
         
         logger.info("转码任务已取消")
         self.is_running = False
@@ -215,7 +438,7 @@ class TaskManager:
             task_index: 任务索引
             
         Returns:
-            dict: 任务状态信息
+            Task: 任务状态信息
         """
         if 0 <= task_index < len(self.tasks):
             return self.tasks[task_index]
@@ -226,7 +449,7 @@ class TaskManager:
         获取所有任务的状态
         
         Returns:
-            list: 所有任务的状态信息
+            list: 所有任务（Task对象）的状态信息
         """
         return self.tasks
     
@@ -237,7 +460,7 @@ class TaskManager:
         Returns:
             int: 已完成的任务数量
         """
-        return self.completed_count
+        return self._status_counts["completed"]
     
     def get_failed_count(self):
         """
@@ -246,7 +469,7 @@ class TaskManager:
         Returns:
             int: 失败的任务数量
         """
-        return sum(1 for task in self.tasks if task["status"] == "failed")
+        return self._status_counts["failed"]
     
     def get_cancelled_count(self):
         """
@@ -255,7 +478,18 @@ class TaskManager:
         Returns:
             int: 已取消的任务数量
         """
-        return sum(1 for task in self.tasks if task["status"] == "cancelled")
+        return self._status_counts["cancelled"]
+    
+    def get_counts(self):
+        """
+        在一次加锁内获取所有任务计数，保证各计数来自同一时刻
+        
+        Returns:
+            TaskCounts: (总数, 已完成, 失败, 已取消)的计数快照
+        """
+        with self._lock:
+            counts = self._status_counts
+            return TaskCounts(len(self.tasks), counts["completed"], counts["failed"], counts["cancelled"])
     
     def get_total_count(self):
         """
@@ -270,12 +504,16 @@ class TaskManager:
         """
         清空所有任务
         """
+        self._stop_workers()
+        self._queues = []
+        self._stop_event = None
+        self._workers = []
         self.tasks = []
         self.task_results = {}
         self.is_running = False
         self.is_paused = False
-        self.is_cancelled = False
-        self.completed_count = 0
+        self._cancel_event.clear()
+        self._status_counts = self._new_status_counts()
         self.total_count = 0
         logger.info("已清空所有转码任务")
     
@@ -283,7 +521,7 @@ class TaskManager:
         """
         重试所有失败的任务
         """
-        failed_tasks = [task for task in self.tasks if task["status"] == "failed"]
+        failed_tasks = [task for task in self.tasks if task.status == "failed"]
         if not failed_tasks:
             logger.warning("没有失败的任务可以重试")
             return
@@ -291,10 +529,11 @@ class TaskManager:
         logger.info(f"开始重试失败的任务，共 {len(failed_tasks)} 个任务")
         
         # 重置失败任务的状态
-        for task in failed_tasks:
-            task["status"] = "waiting"
-            task["progress"] = 0.0
-            task["error_msg"] = ""
+        with self._lock:
+            for task in failed_tasks:
+                self._set_status(task, "waiting")
+                task.progress = 0.0
+                task.error_msg = ""
         
         # 重新开始执行任务
         self.start()
@@ -6,15 +6,434 @@
 """
 
 import os
-import subprocess
 import re
+import logging
+import subprocess
+import signal
 import sys
 import threading
+import time
+import datetime
+import queue
+import multiprocessing
+import uuid
+from collections import deque, defaultdict, namedtuple
+from fractions import Fraction
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 # 修改导入方式，使用绝对导入
 from utils.logger import get_logger
 
+# PyAV为可选依赖，可用时短文件在进程内完成解码和编码，省去启动FFmpeg进程的开销
+try:
+    import av
+except ImportError:
+    av = None
+
 logger = get_logger(__name__)
 
+# 进度回调的最小间隔（秒），同一文件在间隔内的进度更新会被丢弃
+_PROGRESS_INTERVAL = 0.1
+
+# 无法获取视频时长时用于计算进度的默认时长（秒）
+_DEFAULT_DURATION = 600.0
+
+# ffprobe探测的超时时间（秒），损坏的文件不应让转码任务一直卡在探测阶段
+_PROBE_TIMEOUT = 5
+
+# 通过stdout输出结构化的key=value进度记录，并关闭stderr上的进度统计
+_PROGRESS_FLAGS = ["-nostats", "-progress", "pipe:1"]
+
+# FFmpeg -progress输出中表示已转码时长（微秒）的键；只需前缀判断和一次int()，
+# 不再需要对stderr中的time=HH:MM:SS.xx执行正则匹配
+_OUT_TIME_KEY = "out_time_us="
+
+# 保留的FFmpeg输出尾部行数，用于失败时的错误分析
+_STDERR_TAIL = 200
+
+# 读取线程与处理进度的线程之间的队列容量（条），处理方跟不上时多出的记录被丢弃
+_PROGRESS_QUEUE_SIZE = 256
+
+# FFmpeg输出管道的缓冲区大小，块缓冲避免无缓冲模式下逐字节读取的系统调用开销
+# 文本模式按行读取时每次只取管道中已有的数据，不会等缓冲区填满，因此不会延迟进度行；
+# 不使用bufsize=0（每次读取都是一次系统调用），也无需bufsize=1（行缓冲只影响写入方向）
+_PIPE_BUFSIZE = 1 << 20
+
+# 按平台排列的硬件H.264编码器候选，越靠前优先级越高
+if sys.platform == "darwin":
+    _HW_ENCODERS = ("h264_videotoolbox",)
+elif os.name == 'nt':
+    _HW_ENCODERS = ("h264_nvenc", "h264_qsv")
+else:
+    _HW_ENCODERS = ("h264_nvenc", "h264_qsv", "h264_vaapi")
+
+# VAAPI使用的DRM渲染设备
+_VAAPI_DEVICE = "/dev/dri/renderD128"
+
+# 各硬件编码器对应的硬件解码输入参数，解码后的帧直接留在显存中交给编码器
+_HW_DECODE_FLAGS = {
+    "h264_nvenc": ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"],
+    "h264_vaapi": ["-hwaccel", "vaapi", "-vaapi_device", _VAAPI_DEVICE, "-hwaccel_output_format", "vaapi"],
+}
+
+# 检测硬件编码器时，测试编码除编码器外还需要的(输入前参数, 输出参数)
+_HW_PROBE_FLAGS = {
+    "h264_vaapi": (["-vaapi_device", _VAAPI_DEVICE], ["-vf", "format=nv12,hwupload"]),
+}
+
+# 未配置x264_preset时使用的libx264编码预设
+_DEFAULT_X264_PRESET = "veryfast"
+
+# 根据某一配置版本构建的全部命令参数片段，整体替换发布，工作线程不会读到新旧混合的片段
+_CommandTemplates = namedtuple("_CommandTemplates", (
+    "version", "input_flags", "video_flags", "hw_encoder", "threads", "crf",
+    "audio_flags_on", "audio_flags_off", "encode_tail", "tail", "overwrite_flag",
+))
+
+# libx264输出的H.264级别，单文件转码、PyAV转码和重新编码合并统一使用；4.0支持1080p30和720p60
+_H264_LEVEL = "4.0"
+
+# 可以直接流复制合并的输入扩展名：MP4，以及按片段输出的MPEG-TS
+_STREAM_COPY_EXTS = (".mp4", ".ts")
+
+# 请求FFmpeg退出后等待的最长时间（秒），超时后强制结束进程
+_STOP_TIMEOUT = 5
+
+# 使用PyAV进程内转码的文件大小上限（字节），更大的文件逐帧Python开销超过进程启动开销，仍使用FFmpeg命令行
+_PYAV_MAX_SIZE = 50 * 1024 * 1024
+
+# 需要警告的FFmpeg严重错误关键字
+_ERROR_KEYWORDS = ("error:", "failed:", "could not", "unable to", "no start code", "invalid data")
+
+# 失败时用于提取错误详情的关键字
+_ERR_KWS = ("error", "failed", "could not", "unable to")
+
+# 将关键字编译为忽略大小写的单个正则，每行只扫描一遍，也无需先创建小写副本
+_ERROR_KEYWORDS_RE = re.compile("|".join(map(re.escape, _ERROR_KEYWORDS)), re.IGNORECASE)
+_ERR_RE = re.compile("|".join(map(re.escape, _ERR_KWS)), re.IGNORECASE)
+
+
+def _hidden_window_kwargs():
+    """
+    生成在Windows上隐藏子进程控制台窗口的subprocess参数
+    
+    Returns:
+        dict: creationflags和startupinfo参数，非Windows平台为空字典
+    """
+    if os.name != 'nt':
+        return {}
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    startupinfo.wShowWindow = 0  # SW_HIDE
+    return {"creationflags": subprocess.CREATE_NO_WINDOW, "startupinfo": startupinfo}
+
+
+# 所有子进程共用的隐藏窗口参数，模块加载时计算一次；同时并发启动多个FFmpeg时也不会闪出控制台窗口
+_NO_WINDOW_KWARGS = _hidden_window_kwargs()
+
+# 读取FFmpeg输出时共用的Popen参数，使用块缓冲读取输出，减少读取管道的系统调用
+# stdin显式指向空设备，GUI程序没有有效的标准输入句柄，继承后FFmpeg会报警告并拖慢启动
+_POPEN_KWARGS = dict(
+    stdin=subprocess.DEVNULL,
+    stdout=subprocess.PIPE,
+    stderr=subprocess.PIPE,
+    universal_newlines=True,
+    encoding='utf-8',
+    errors='ignore',
+    bufsize=_PIPE_BUFSIZE,  # 块缓冲模式
+    **_NO_WINDOW_KWARGS
+)
+
+# concat分离器从stdin读取文件列表时使用的Popen参数
+_POPEN_STDIN_KWARGS = dict(_POPEN_KWARGS, stdin=subprocess.PIPE)
+
+
+def _stop_process(process):
+    """
+    请求FFmpeg退出，超时仍未退出时由后台线程强制结束，调用方不会被阻塞
+    
+    POSIX发送SIGINT，FFmpeg收到中断后会刷新封装器（如写入MP4的moov）后退出。
+    Windows上FFmpeg以CREATE_NO_WINDOW启动，拥有独立的隐藏控制台，父进程发送的控制台事件无法送达，直接terminate。
+    
+    Args:
+        process: subprocess.Popen对象
+    """
+    try:
+        if os.name == 'nt':
+            process.terminate()
+        else:
+            process.send_signal(signal.SIGINT)
+    except OSError:
+        # 进程已经退出
+        return
+    threading.Thread(target=_kill_after_timeout, args=(process,), daemon=True).start()
+
+
+def _kill_after_timeout(process):
+    """
+    等待进程在_STOP_TIMEOUT秒内退出，否则强制结束，避免读取输出的线程一直等不到EOF
+    
+    Args:
+        process: subprocess.Popen对象
+    """
+    try:
+        process.wait(timeout=_STOP_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        logger.warning(f"FFmpeg进程未在{_STOP_TIMEOUT}秒内退出，强制结束: {process.pid}")
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+
+def _nt_suspend_resume(pid, suspend):
+    """
+    通过ntdll的NtSuspendProcess/NtResumeProcess挂起或恢复Windows进程
+    
+    Args:
+        pid: 进程ID
+        suspend: True表示挂起，False表示恢复
+    """
+    import ctypes
+    PROCESS_SUSPEND_RESUME = 0x0800
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(PROCESS_SUSPEND_RESUME, False, pid)
+    if not handle:
+        raise OSError(f"无法打开进程: {pid}")
+    try:
+        if suspend:
+            ctypes.windll.ntdll.NtSuspendProcess(handle)
+        else:
+            ctypes.windll.ntdll.NtResumeProcess(handle)
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _set_process_suspended(process, suspend):
+    """
+    挂起或恢复子进程，暂停期间FFmpeg不再占用CPU
+    
+    Args:
+        process: subprocess.Popen对象
+        suspend: True表示挂起，False表示恢复
+    """
+    if process.poll() is not None:
+        return
+    try:
+        if os.name != 'nt':
+            os.kill(process.pid, signal.SIGSTOP if suspend else signal.SIGCONT)
+            return
+        # Windows没有SIGSTOP，优先使用可选的psutil，未安装时直接调用ntdll
+        try:
+            import psutil
+        except ImportError:
+            _nt_suspend_resume(process.pid, suspend)
+            return
+        if suspend:
+            psutil.Process(process.pid).suspend()
+        else:
+            psutil.Process(process.pid).resume()
+    except Exception as e:
+        logger.warning(f"无法{'挂起' if suspend else '恢复'}FFmpeg进程: {e}")
+
+
+# concat分离器从stdin读取文件列表时的输入参数；列表中的文件需要file协议，而列表本身来自pipe协议
+_CONCAT_STDIN_FLAGS = ["-f", "concat", "-safe", "0", "-protocol_whitelist", "file,pipe"]
+
+
+def _concat_list(input_files):
+    """
+    生成concat分离器使用的文件列表内容，通过stdin传给FFmpeg，无需在磁盘上创建临时文件
+    
+    Args:
+        input_files: 输入文件列表
+        
+    Returns:
+        str: 每行一个file指令的文件列表
+    """
+    # 使用绝对路径，避免FFmpeg找不到文件；按concat格式用单引号包裹，路径中的单引号转义为'\''
+    return "".join(
+        "file '" + path.replace("'", "'\\''") + "'\n"
+        for path in map(os.path.abspath, input_files)
+    )
+
+
+def _write_concat_list(process, list_data):
+    """
+    将文件列表一次性写入FFmpeg的stdin并关闭，concat分离器读到EOF后开始处理
+    
+    Args:
+        process: stdin为管道的FFmpeg进程
+        list_data: _concat_list生成的文件列表内容
+    """
+    try:
+        process.stdin.write(list_data)
+        process.stdin.close()
+    except BrokenPipeError:
+        # FFmpeg在读完列表前已退出（如参数错误或被取消），失败原因由返回码和stderr给出
+        logger.debug("FFmpeg已关闭stdin，文件列表未完整写入")
+
+
+def _file_sizes(paths):
+    """
+    按所在目录分组，每个目录只用os.scandir读取一次，获取各文件的大小
+    
+    Args:
+        paths: 文件路径列表
+        
+    Returns:
+        dict: 文件路径到文件大小的映射，不存在的文件对应None
+    """
+    buckets = defaultdict(dict)
+    for path in paths:
+        directory, name = os.path.split(path)
+        buckets[directory][name] = path
+    
+    sizes = {}
+    for directory, names in buckets.items():
+        try:
+            with os.scandir(directory or ".") as it:
+                for entry in it:
+                    path = names.get(entry.name)
+                    if path is not None and entry.is_file():
+                        sizes[path] = entry.stat().st_size
+        except OSError:
+            pass
+        # 目录无法列出或名称大小写与目录项不一致时，逐个stat兜底
+        for path in names.values():
+            if path not in sizes:
+                try:
+                    sizes[path] = os.stat(path).st_size
+                except OSError:
+                    sizes[path] = None
+    return sizes
+
+
+def _parse_out_time(line):
+    """
+    从FFmpeg -progress输出的一行中解析已转码时长
+    
+    Args:
+        line: 形如out_time_us=12345678的输出行
+        
+    Returns:
+        float: 已转码时长（秒），若该行不是时长记录或值无效则返回None
+    """
+    if not line.startswith(_OUT_TIME_KEY):
+        return None
+    try:
+        return int(line[len(_OUT_TIME_KEY):]) / 1000000
+    except ValueError:
+        # 刚开始转码时值可能为N/A
+        return None
+
+
+def _start_stderr_reader(stream):
+    """
+    启动后台线程读取FFmpeg的stderr，只保留最近的输出用于错误分析
+    
+    Args:
+        stream: FFmpeg进程的stderr管道
+        
+    Returns:
+        tuple: (读取线程, 保存最近输出行的deque)
+    """
+    tail = deque(maxlen=_STDERR_TAIL)
+    
+    def read():
+        for line in stream:
+            # 只去掉行尾换行和空白，保留FFmpeg输出的缩进，错误报告更易读
+            line = line.rstrip()
+            tail.append(line)
+            # 只对严重错误警告，对于一些非致命错误，FFmpeg可能仍能继续处理
+            if _ERROR_KEYWORDS_RE.search(line):
+                logger.warning(f"FFmpeg警告/错误: {line}")
+    
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    return thread, tail
+
+
+def _progress_records(stream):
+    """
+    启动后台线程持续读取FFmpeg的-progress输出，调用方在自己的线程中逐条处理
+    
+    读取线程只负责清空管道，进度回调较慢（如GUI卡顿）时管道不会被写满，FFmpeg也就不会因此阻塞编码。
+    
+    Args:
+        stream: FFmpeg进程的stdout管道
+    
+    Yields:
+        str: 进度记录行（out_time_us=或progress=），回调处理期间积压的记录只保留最新一条
+    """
+    records = queue.Queue(maxsize=_PROGRESS_QUEUE_SIZE)
+    
+    def read():
+        for line in stream:
+            # 只转发计算进度需要的记录，其余键直接丢弃
+            if line.startswith(_OUT_TIME_KEY) or line.startswith("progress="):
+                try:
+                    records.put_nowait(line)
+                except queue.Full:
+                    # 队列已满说明处理方跟不上，旧记录本就会被跳过，丢弃也不影响最终进度
+                    pass
+        # 结束标记同样不阻塞：处理方提前停止读取（如取消或回调异常）时队列可能一直是满的，
+        # 阻塞的put会让读取线程永远挂起并持有管道；此时丢弃最旧的一条记录腾出位置
+        while True:
+            try:
+                records.put_nowait(None)
+                return
+            except queue.Full:
+                try:
+                    records.get_nowait()
+                except queue.Empty:
+                    pass
+    
+    threading.Thread(target=read, daemon=True).start()
+    
+    while True:
+        line = records.get()
+        if line is None:
+            return
+        try:
+            while True:
+                newer = records.get_nowait()
+                if newer is None:
+                    yield line
+                    return
+                line = newer
+        except queue.Empty:
+            pass
+        yield line
+
+
+def _throttled(fn, interval=_PROGRESS_INTERVAL):
+    """
+    包装进度回调函数，按文件名节流，减少跨线程的GUI更新次数
+    
+    Args:
+        fn: 原始进度回调函数，接收文件名和进度百分比作为参数
+        interval: 同一文件两次回调之间的最小间隔（秒）
+        
+    Returns:
+        function: 节流后的进度回调函数，0%和100%总是会被传递，与上次相同的进度值会被丢弃
+    """
+    # 文件名 -> (上次回调时间, 上次回调的进度)
+    last_emit = {}
+    
+    def wrapper(filename, progress):
+        now = time.monotonic()
+        previous = last_emit.get(filename)
+        if previous is not None:
+            # progress=end和转码结束时都会上报100%，重复的进度值不再触发GUI更新
+            if progress == previous[1]:
+                return
+            if 0.0 < progress < 100.0 and now - previous[0] < interval:
+                return
+        last_emit[filename] = (now, progress)
+        fn(filename, progress)
+    
+    return wrapper
+
 
 class TranscodeEngine:
     """
@@ -44,9 +463,38 @@ class TranscodeEngine:
             ffmpeg_path = os.path.join(base_path, ffmpeg_path)
         
         self.ffmpeg_path = ffmpeg_path
-        self.is_paused = False
-        self.is_cancelled = False
+        # ffprobe与ffmpeg位于同一目录，文件名中的ffmpeg替换为ffprobe
+        ffmpeg_dir, ffmpeg_name = os.path.split(ffmpeg_path)
+        self.ffprobe_path = os.path.join(ffmpeg_dir, ffmpeg_name.replace("ffmpeg", "ffprobe"))
+        # 视频时长缓存，键为(路径, 修改时间, 文件大小)，重复转码同一文件时无需再次探测
+        self._duration_cache = {}
+        # 视频流参数缓存，键同上，判断多次合并能否流复制时无需重复调用ffprobe
+        self._video_params_cache = {}
+        self._current_duration = None
+        # 本轮任务中已确认存在的输出目录，reset时清空，下一轮重新确认
+        self._known_dirs = set()
+        # 可用的硬件编码器，首次启用GPU编码时检测一次；None表示尚未检测
+        self._hw_encoder = None
+        # 保证多个工作线程共享引擎时只检测一次硬件编码器，检测完成前其他线程等待结果
+        self._hw_lock = threading.Lock()
+        # 当前配置对应的命令参数片段（_CommandTemplates），None表示尚未构建
+        self._templates = None
+        # 重新编码合并的参数片段：(构建时依据的_CommandTemplates, 参数片段)，首次合并时构建
+        self._merge_templates = None
+        # 保证配置变化后只有一个线程重建参数片段
+        self._templates_lock = threading.Lock()
+        # 暂停事件：置位表示运行，清除表示暂停；读取输出的线程在事件上阻塞等待，不再轮询
+        self._pause_event = threading.Event()
+        self._pause_event.set()
+        # 正在运行的FFmpeg进程，暂停时挂起、恢复时继续；引擎可能被多个线程同时使用
+        self._active_processes = set()
+        self._process_lock = threading.Lock()
+        # 取消事件：cancel()直接终止正在运行的FFmpeg进程，读取线程随管道EOF退出，无需逐行检查
+        self._cancel_event = threading.Event()
         self.progress_callback = None
+        # 预先构建的Popen参数：stdout读取-progress记录，stderr单独读取
+        self._popen_kwargs = _POPEN_KWARGS
+        self._popen_stdin_kwargs = _POPEN_STDIN_KWARGS
     
     def set_progress_callback(self, callback):
         """
@@ -55,143 +503,473 @@ class TranscodeEngine:
         Args:
             callback: 进度回调函数，接收文件名和进度百分比作为参数
         """
-        self.progress_callback = callback
+        # 对回调进行节流，避免FFmpeg每输出一行进度就触发一次GUI更新
+        self.progress_callback = _throttled(callback) if callback else None
+    
+    @property
+    def is_paused(self):
+        """
+        转码是否处于暂停状态
+        """
+        return not self._pause_event.is_set()
+    
+    @property
+    def is_cancelled(self):
+        """
+        转码是否已被取消
+        """
+        return self._cancel_event.is_set()
+    
+    def _track_process(self, process):
+        """
+        登记正在运行的FFmpeg进程，若当前已暂停则立即挂起
+        
+        Args:
+            process: subprocess.Popen对象
+        """
+        with self._process_lock:
+            self._active_processes.add(process)
+            if self.is_cancelled:
+                # 取消之后才启动的进程直接结束
+                _stop_process(process)
+            elif self.is_paused:
+                _set_process_suspended(process, True)
+    
+    def _untrack_process(self, process):
+        """
+        移除已结束的FFmpeg进程登记
+        
+        Args:
+            process: subprocess.Popen对象，可以为None
+        """
+        with self._process_lock:
+            self._active_processes.discard(process)
+    
+    def _set_active_suspended(self, suspend):
+        """
+        挂起或恢复所有正在运行的FFmpeg进程
+        
+        Args:
+            suspend: True表示挂起，False表示恢复
+        """
+        with self._process_lock:
+            for process in self._active_processes:
+                _set_process_suspended(process, suspend)
     
     def pause(self):
         """
-        暂停转码操作
+        暂停转码操作，挂起FFmpeg进程使其真正停止编码
         """
-        self.is_paused = True
+        self._pause_event.clear()
+        self._set_active_suspended(True)
         logger.info("转码操作已暂停")
     
     def resume(self):
         """
         恢复转码操作
         """
-        self.is_paused = False
+        self._set_active_suspended(False)
+        self._pause_event.set()
         logger.info("转码操作已恢复")
     
     def cancel(self):
         """
         取消转码操作
         """
-        self.is_cancelled = True
+        self._cancel_event.set()
+        # 被挂起的进程无法响应终止信号，先恢复运行并唤醒等待中的读取线程
+        self._set_active_suspended(False)
+        self._pause_event.set()
+        # 在调用线程中请求进程结束，读取线程读到EOF后返回取消结果
+        with self._process_lock:
+            for process in self._active_processes:
+                if process.poll() is None:
+                    _stop_process(process)
         logger.info("转码操作已取消")
     
     def reset(self):
         """
-        重置转码状态
+        重置转码状态，由一批任务的调用方（如TaskManager.start）在开始前调用一次；
+        引擎被多个工作线程共享，单个文件的转码和合并不再各自重置，以免清除用户的暂停或取消
         """
-        self.is_paused = False
-        self.is_cancelled = False
+        self._pause_event.set()
+        self._cancel_event.clear()
+        # 两轮任务之间输出目录可能被删除或移动，清空后每个目录在新一轮中重新确认一次
+        self._known_dirs.clear()
     
-    def build_ffmpeg_command(self, input_file, output_file, include_audio=False):
+    def _ensure_output_dir(self, output_dir):
         """
-        构建FFmpeg转码命令
+        确保输出目录存在，已确认存在的目录记录到本轮任务结束，同一轮中转码到同一目录时不再访问文件系统
+        
+        Args:
+            output_dir: 输出目录路径，为空表示当前目录
+            
+        Returns:
+            str: 无法创建目录时的错误信息，否则为空字符串
+        """
+        if not output_dir or output_dir in self._known_dirs:
+            return ""
+        try:
+            os.makedirs(output_dir)
+            logger.info(f"创建输出目录: {output_dir}")
+        except FileExistsError:
+            pass
+        except OSError as e:
+            return f"无法创建输出目录: {output_dir}, {str(e)}"
+        self._known_dirs.add(output_dir)
+        return ""
+    
+    def _probe_duration(self, input_file):
+        """
+        使用ffprobe获取视频时长，结果按(路径, 修改时间, 文件大小)缓存
         
         Args:
             input_file: 输入文件路径
-            output_file: 输出文件路径
-            include_audio: 是否包含音频处理（默认False，保持原有行为）
             
         Returns:
-            list: FFmpeg命令列表
+            float: 视频时长（秒），若无法获取则返回None
+        """
+        try:
+            stat = os.stat(input_file)
+        except OSError:
+            return None
+        cache_key = (input_file, stat.st_mtime, stat.st_size)
+        if cache_key in self._duration_cache:
+            return self._duration_cache[cache_key]
+        
+        duration = None
+        try:
+            result = subprocess.run(
+                [self.ffprobe_path, "-v", "error", "-show_entries", "format=duration",
+                 "-of", "default=nk=1:nw=1", input_file],
+                capture_output=True,
+                text=True,
+                timeout=_PROBE_TIMEOUT,
+                **_NO_WINDOW_KWARGS
+            )
+            duration = float(result.stdout.strip())
+            if duration <= 0:
+                duration = None
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            # 裸流文件通常没有时长信息，或ffprobe不可用，此时回退到默认时长
+            logger.debug(f"无法获取视频时长: {input_file}, {e}")
+        
+        self._duration_cache[cache_key] = duration
+        return duration
+    
+    def _detect_hw_encoder(self):
+        """
+        检测可用的硬件H.264编码器，结果缓存在引擎实例上；多个线程同时调用时只检测一次，
+        检测完成后才发布结果，不会有线程在检测期间读到未完成的结果而回退到libx264
+        
+        Returns:
+            str: 可用的硬件编码器名称，若均不可用则返回空字符串
+        """
+        if self._hw_encoder is not None:
+            return self._hw_encoder
+        
+        with self._hw_lock:
+            if self._hw_encoder is None:
+                self._hw_encoder = self._probe_hw_encoder()
+        return self._hw_encoder
+    
+    def _probe_hw_encoder(self):
+        """
+        实际执行硬件编码器检测，由_detect_hw_encoder在锁内调用
+        
+        Returns:
+            str: 可用的硬件编码器名称，若均不可用则返回空字符串
+        """
+        detected = ""
+        try:
+            result = subprocess.run(
+                [self.ffmpeg_path, "-hide_banner", "-encoders"],
+                capture_output=True, text=True, errors='ignore', **_NO_WINDOW_KWARGS
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.debug(f"无法获取FFmpeg编码器列表: {e}")
+            return detected
+        
+        for encoder in _HW_ENCODERS:
+            if encoder not in result.stdout:
+                continue
+            # 编码器编译进FFmpeg不代表有对应硬件，编码一帧测试图像确认可用
+            input_flags, output_flags = _HW_PROBE_FLAGS.get(encoder, ([], []))
+            try:
+                probe = subprocess.run(
+                    [self.ffmpeg_path, "-hide_banner", "-v", "error", *input_flags,
+                     "-f", "lavfi", "-i", "color=size=256x256", "-frames:v", "1",
+                     *output_flags, "-c:v", encoder, "-f", "null", "-"],
+                    capture_output=True, **_NO_WINDOW_KWARGS
+                )
+            except (OSError, subprocess.SubprocessError):
+                continue
+            if probe.returncode == 0:
+                detected = encoder
+                break
+        
+        if detected:
+            logger.info(f"检测到可用的硬件编码器: {detected}")
+        else:
+            logger.info("未检测到可用的硬件编码器，使用libx264")
+        return detected
+    
+    def _active_hw_encoder(self):
+        """
+        获取当前配置下使用的硬件编码器
+        
+        Returns:
+            str: 启用GPU编码且检测到硬件编码器时返回编码器名称，否则返回空字符串
+        """
+        return self._detect_hw_encoder() if self.config_manager.get_config("use_gpu") else ""
+    
+    def _video_filter_args(self, hw_encoder, size=None):
+        """
+        生成视频滤镜/缩放参数，硬件解码的帧位于显存，需要使用对应的GPU滤镜
+        
+        Args:
+            hw_encoder: 硬件编码器名称，为空时使用libx264
+            size: 可选的(宽, 高)输出分辨率
+            
+        Returns:
+            list: 滤镜参数列表
+        """
+        if hw_encoder == "h264_vaapi":
+            # 软件解码回退时先上传到显存；已在显存中的帧直接通过
+            video_filter = "format=nv12|vaapi,hwupload"
+            if size:
+                video_filter += f",scale_vaapi=w={size[0]}:h={size[1]}"
+            return ["-vf", video_filter]
+        if not size:
+            return []
+        if hw_encoder == "h264_nvenc":
+            # CUDA解码的帧位于显存，需要使用GPU缩放
+            return ["-vf", f"scale_cuda={size[0]}:{size[1]}"]
+        return ["-s", f"{size[0]}x{size[1]}"]
+    
+    def _video_codec_args(self, hw_encoder, crf, threads=0):
+        """
+        生成视频编码参数
+        
+        Args:
+            hw_encoder: 硬件编码器名称，为空时使用libx264
+            crf: 视频质量参数
+            threads: libx264编码线程数，0表示由FFmpeg自动选择
+            
+        Returns:
+            list: 视频编码参数列表
+        """
+        if hw_encoder == "h264_nvenc":
+            return ["-c:v", "h264_nvenc", "-preset", "p4", "-tune", "ll",
+                    "-rc", "vbr", "-cq", str(crf), "-b:v", "0",
+                    # 前瞻和空间自适应量化，在固定质量模式下提升画质
+                    "-rc-lookahead", "20", "-spatial-aq", "1"]
+        if hw_encoder == "h264_qsv":
+            return ["-c:v", "h264_qsv", "-preset", "veryfast", "-global_quality", str(crf)]
+        if hw_encoder == "h264_vaapi":
+            return ["-c:v", "h264_vaapi", "-qp", str(crf)]
+        if hw_encoder == "h264_videotoolbox":
+            # VideoToolbox的-q:v取值0-100且越大质量越高，按crf近似换算
+            return ["-c:v", "h264_videotoolbox", "-q:v", str(max(1, min(100, 100 - crf * 2)))]
+        x264opts = []
+        low_latency = self.config_manager.get_config("low_latency")
+        if self.config_manager.get_config("fixed_gop"):
+            # 固定关键帧间隔，仅在需要按固定时长切片时启用，否则由编码器在场景切换处放置I帧
+            x264opts.append("keyint=25:min-keyint=25:no-scenecut")
+        args = [
+            "-c:v", "libx264",  # 使用标准h.264编码，确保通用性
+        ]
+        if threads > 0:
+            # 显式指定线程数：单文件时用满所有核心，批量时每个进程只用少量线程，进程数×线程数≈核心数
+            args.extend(["-threads", str(threads)])
+            x264opts.append(f"threads={threads}")
+            if low_latency:
+                # 切片线程没有帧线程的延迟，但压缩效率较低，只在低延迟模式下使用
+                x264opts.append("sliced-threads=1")
+        args.extend([
+            "-preset", self._x264_preset(),  # 编码预设，默认veryfast
+            "-crf", str(crf),  # 视频质量参数
+        ])
+        if low_latency:
+            # 低延迟模式会关闭B帧和前瞻，文件转码时降低压缩效率，仅在需要时启用
+            args.extend(["-tune", "zerolatency"])
+        if x264opts:
+            args.extend(["-x264opts", ":".join(x264opts)])
+        return args
+    
+    def _x264_preset(self):
+        """
+        获取配置的libx264编码预设
+        
+        Returns:
+            str: 编码预设名称
+        """
+        return self.config_manager.get_config("x264_preset") or _DEFAULT_X264_PRESET
+    
+    def _rebuild_templates(self, version):
+        """
+        根据当前配置预先构建FFmpeg命令中与输入输出文件无关的参数片段，全部构建在局部变量中
+        
+        Args:
+            version: 读取配置前的配置版本号，构建期间配置再次变化时下次调用会重新构建
+            
+        Returns:
+            _CommandTemplates: 参数片段
         """
         # 获取配置参数
-        video_codec = self.config_manager.get_config("video_codec")
         crf = self.config_manager.get_config("crf")
         audio_codec = self.config_manager.get_config("audio_codec")
         audio_bitrate = self.config_manager.get_config("audio_bitrate")
-        threads = self.config_manager.get_config("threads")
         overwrite = self.config_manager.get_config("overwrite")
+        # 每个FFmpeg进程的编码线程数，0表示自动
+        threads = max(0, int(self.config_manager.get_config("threads") or 0))
+        # 只转封装时不需要编码器，也就不必检测硬件编码器
+        remux_only = self.config_manager.get_config("remux_only")
+        # 启用GPU编码且检测到硬件编码器时使用硬件编码，否则使用libx264
+        hw_encoder = "" if remux_only else self._active_hw_encoder()
         
         # 构建FFmpeg命令 - 生成通用MP4格式，支持拖动播放
         # 对于v264文件，我们需要先解码再编码，确保生成标准MP4格式
         # 注意：海雀监控的.v264文件实际上是HEVC/H.265格式，不是H.264格式
         # 修复：修改输入格式检测方式，使用更通用的参数来处理裸流
-        command = [
+        input_flags = [
             self.ffmpeg_path,
+            *_PROGRESS_FLAGS,
             # 输入参数
             # 修改：不强制指定输入格式，让FFmpeg自动检测
             # 增加更宽松的分析参数以处理可能不标准的裸流
             "-analyzeduration", "20M",  # 进一步增加分析时间
             "-probesize", "20M",  # 进一步增加缓冲区大小
-            "-fflags", "+genpts+igndts",  # 生成显示时间戳并忽略DTS错误
+            "-fflags", "+genpts+igndts+discardcorrupt",  # 生成显示时间戳、忽略DTS错误并丢弃损坏的包
             "-err_detect", "ignore_err",  # 忽略解码错误，尝试继续处理
-            "-i", input_file,
-            # 视频编码参数
-            "-c:v", "libx264",  # 使用标准h.264编码，确保通用性
-            "-preset", "fast",  # 快速编码预设
-            "-crf", str(crf),  # 视频质量参数
-            # 添加更多容错参数
-            "-tune", "zerolatency",  # 低延迟模式，有助于处理问题流
-            "-x264opts", "keyint=25:min-keyint=25:no-scenecut",  # 固定关键帧间隔
         ]
+        # 裸流通常不带帧率信息，FFmpeg按25fps处理；帧率不同的摄像头可通过input_fps指定
+        input_fps = self.config_manager.get_config("input_fps")
+        if input_fps:
+            input_flags.extend(["-r", str(input_fps)])
+        # 硬件编码时使用对应的硬件解码，解码后的帧直接留在显存中交给编码器
+        input_flags.extend(_HW_DECODE_FLAGS.get(hw_encoder, []))
         
-        # 根据include_audio参数决定是否处理音频
-        if include_audio:
-            # 音频处理参数
-            command.extend([
-                "-c:a", audio_codec,  # 使用配置的音频编码器
-                "-b:a", audio_bitrate,  # 使用配置的音频比特率
-            ])
+        # 视频编码参数
+        if remux_only:
+            # 直接复制视频流，省去全部解码和编码
+            video_flags = ["-c:v", "copy"]
         else:
-            # 保持原有行为，禁用音频流
-            command.append("-an")  # 禁用音频流（v264文件通常没有音频）
-        
-        # 继续添加其他参数
-        command.extend([
-                # 兼容性参数
-                "-profile:v", "main",  # 使用main profile确保兼容性
-                "-level", "4.0",  # 提高级别以支持更高分辨率
+            video_flags = self._video_filter_args(hw_encoder) + self._video_codec_args(hw_encoder, crf, threads)
+        # 根据include_audio参数决定是否处理音频
+        audio_flags_on = [
+            "-c:a", audio_codec,  # 使用配置的音频编码器
+            "-b:a", audio_bitrate,  # 使用配置的音频比特率
+        ]
+        # 保持原有行为，禁用音频流（v264文件通常没有音频）
+        audio_flags_off = ["-an"]
+        
+        # 兼容性参数
+        encode_flags = ["-profile:v", "main"]  # 使用main profile确保兼容性
+        if not hw_encoder:
+            # 硬件编码器自动选择级别；NVENC的输入帧位于显存，不能再转换像素格式
+            encode_flags.extend([
+                "-level", _H264_LEVEL,  # 提高级别以支持更高分辨率
                 "-pix_fmt", "yuv420p",  # 使用通用的YUV格式
-                # MP4封装参数
-                "-movflags", "faststart",  # 将元数据移到文件头部，支持拖动播放
-                # 输出参数
-                "-y" if overwrite else "-n",
-                # 添加严格实验性功能支持（处理非标准流）
-                "-strict", "experimental",
-                output_file
             ])
+        output_flags = [
+            # MP4封装参数
+            "-movflags", "faststart",  # 将元数据移到文件头部，支持拖动播放
+            # 输出参数
+            "-y" if overwrite else "-n",
+            # 添加严格实验性功能支持（处理非标准流）
+            "-strict", "experimental",
+        ]
+        # 多输出命令总是重新编码，需要带编码参数的尾部
+        encode_tail = encode_flags + output_flags
+        # profile、level和像素格式只对编码有效，流复制时省略
+        tail = output_flags if remux_only else encode_tail
         
-        logger.debug(f"构建FFmpeg命令: {' '.join(command)}")
+        # 多输出命令和重新编码合并需要按编码器、线程数和crf重新生成视频编码参数
+        return _CommandTemplates(
+            version, input_flags, video_flags, hw_encoder, threads, crf,
+            audio_flags_on, audio_flags_off, encode_tail, tail, "-y" if overwrite else "-n",
+        )
+    
+    def _ensure_templates(self):
+        """
+        获取与当前配置一致的参数片段，只在配置变化后重新构建，批量转码时每个文件只需拼接列表
+        
+        Returns:
+            _CommandTemplates: 参数片段；调用方在构建一条命令期间只使用这一份，
+                               其他线程重建时发布新对象，不会修改已取得的片段
+        """
+        version = getattr(self.config_manager, "version", 0)
+        templates = self._templates
+        if templates is not None and templates.version == version:
+            return templates
+        with self._templates_lock:
+            templates = self._templates
+            if templates is None or templates.version != version:
+                templates = self._rebuild_templates(version)
+                self._templates = templates
+        return templates
+    
+    def refresh_config(self):
+        """
+        重新读取配置，下次构建命令时重建参数片段
+        
+        通过ConfigManager.set_config修改的配置会自动生效，只有直接修改配置文件或配置字典时才需要调用
+        """
+        self._templates = None
+    
+    def build_ffmpeg_command(self, input_file, output_file, include_audio=False):
+        """
+        构建FFmpeg转码命令
+        
+        Args:
+            input_file: 输入文件路径
+            output_file: 输出文件路径
+            include_audio: 是否包含音频处理（默认False，保持原有行为）
+            
+        Returns:
+            list: FFmpeg命令列表
+        """
+        templates = self._ensure_templates()
+        
+        command = [
+            *templates.input_flags,
+            "-i", input_file,
+            *templates.video_flags,
+            *(templates.audio_flags_on if include_audio else templates.audio_flags_off),
+            *templates.tail,
+            output_file
+        ]
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"构建FFmpeg命令: {' '.join(command)}")
         return command
     
-    def extract_progress(self, output_line):
+    def extract_progress(self, output_line, duration=None):
         """
-        从FFmpeg输出中提取转码进度
+        从FFmpeg -progress输出中提取转码进度
         
         Args:
-            output_line: FFmpeg输出行
+            output_line: FFmpeg -progress输出的key=value行
+            duration: 视频时长（秒），为None时使用最近一次探测的时长
             
         Returns:
             float: 转码进度百分比，若无法提取则返回-1
         """
-        # 匹配FFmpeg输出中的时间信息，格式如：time=00:01:23.45
-        time_match = re.search(r"time=(\d+):(\d+):(\d+\.\d+)", output_line)
-        if time_match:
-            # 计算已转码时间（秒）
-            hours = int(time_match.group(1))
-            minutes = int(time_match.group(2))
-            seconds = float(time_match.group(3))
-            total_seconds = hours * 3600 + minutes * 60 + seconds
-            
-            # 这里简化处理，假设视频时长为10分钟（600秒）
-            # 实际应用中应先获取视频时长
-            video_duration = 600.0
+        total_seconds = _parse_out_time(output_line)
+        if total_seconds is not None:
+            # 使用转码前探测到的视频时长，无法获取时回退到默认时长
+            # 引擎可能被多个线程共用，调用方应传入各自的时长而不依赖共享的_current_duration
+            video_duration = duration or self._current_duration or _DEFAULT_DURATION
             progress = (total_seconds / video_duration) * 100
             
             # 确保进度在0-100之间
-            progress = max(0, min(100, progress))
-            logger.debug(f"转码进度: {progress:.1f}%")
-            return progress
+            return max(0, min(100, progress))
+        
+        # progress=end表示FFmpeg已完成全部输出
+        if output_line.startswith("progress=end"):
+            return 100.0
         
-        # 检查是否有错误信息，但不要对所有错误都警告，只对严重错误警告
-        # 对于一些非致命错误，FFmpeg可能仍能继续处理
-        error_keywords = ["error:", "failed:", "could not", "unable to", "no start code", "invalid data"]
-        if any(keyword in output_line.lower() for keyword in error_keywords):
-            logger.warning(f"FFmpeg警告/错误: {output_line.strip()}")
-            
         return -1
     
     def transcode_file(self, input_file, output_file, include_audio=False):
@@ -208,9 +986,6 @@ class TranscodeEngine:
         """
         logger.info(f"开始转码文件: {input_file} -> {output_file} (音频处理: {'启用' if include_audio else '禁用'})")
         
-        # 重置状态
-        self.reset()
-        
         # 检查输入文件是否存在
         if not os.path.exists(input_file):
             error_msg = f"输入文件不存在: {input_file}"
@@ -218,86 +993,250 @@ class TranscodeEngine:
             return False, error_msg
         
         # 检查输出目录是否存在，不存在则创建
-        output_dir = os.path.dirname(output_file)
-        if not os.path.exists(output_dir):
-            try:
-                os.makedirs(output_dir, exist_ok=True)
-                logger.info(f"创建输出目录: {output_dir}")
-            except Exception as e:
-                error_msg = f"无法创建输出目录: {output_dir}, {str(e)}"
-                logger.error(f"转码失败: {output_dir}, {str(e)}")
-                return False, error_msg
+        error_msg = self._ensure_output_dir(os.path.dirname(output_file))
+        if error_msg:
+            logger.error(f"转码失败: {error_msg}")
+            return False, error_msg
         
-        try:
-            # 构建FFmpeg命令
-            command = self.build_ffmpeg_command(input_file, output_file, include_audio)
+        # 转码前探测一次视频时长，用于计算真实的转码进度
+        duration = self._probe_duration(input_file)
+        self._current_duration = duration
+        
+        if self._use_pyav(input_file, include_audio):
+            return self._pyav_transcode(input_file, output_file, include_audio, duration)
+        
+        # 构建FFmpeg命令
+        command = self.build_ffmpeg_command(input_file, output_file, include_audio)
+        return self._run_transcode(command, input_file, output_file, duration)
+    
+    def _use_pyav(self, input_file, include_audio):
+        """
+        判断是否使用PyAV在进程内转码：需安装PyAV并启用use_pyav，且为不含音频处理的短文件
+        
+        Args:
+            input_file: 输入文件路径
+            include_audio: 是否包含音频处理
             
-            # 执行FFmpeg命令，使用更低的bufsize并禁用输出缓冲
-            # 确保命令列表中的路径正确处理，尤其是带空格的路径
-            # subprocess会自动处理命令列表中的空格，不需要额外引号
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                encoding='utf-8',
-                errors='ignore',
-                bufsize=0,  # 无缓冲模式
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
+        Returns:
+            bool: 是否使用PyAV转码
+        """
+        if av is None or include_audio or not self.config_manager.get_config("use_pyav"):
+            return False
+        # 硬件编码和只转封装只在FFmpeg命令行路径中实现
+        if self.config_manager.get_config("use_gpu") or self.config_manager.get_config("remux_only"):
+            return False
+        try:
+            return os.path.getsize(input_file) < _PYAV_MAX_SIZE
+        except OSError:
+            return False
+    
+    def _pyav_transcode(self, input_file, output_file, include_audio=False, duration=None):
+        """
+        使用PyAV在进程内转码单个视频文件，编码参数与FFmpeg命令行路径保持一致
+        
+        Args:
+            input_file: 输入文件路径
+            output_file: 输出文件路径
+            include_audio: 是否包含音频处理，PyAV路径只处理视频，调用方需保证为False
+            duration: 视频时长（秒），用于计算进度
             
-            # 读取FFmpeg输出，监控转码进度
-            ffmpeg_output = []
-            for line in iter(process.stdout.readline, ''):
-                # 保存FFmpeg输出，用于错误分析
-                ffmpeg_output.append(line.strip())
+        Returns:
+            tuple: (转码成功状态, 错误信息)
+        """
+        if os.path.exists(output_file) and not self.config_manager.get_config("overwrite"):
+            error_msg = f"输出文件已存在: {output_file}"
+            logger.error(f"转码失败: {error_msg}")
+            return False, error_msg
+        
+        crf = self.config_manager.get_config("crf")
+        threads = max(0, int(self.config_manager.get_config("threads") or 0))
+        filename = os.path.basename(input_file)
+        duration = duration or _DEFAULT_DURATION
+        
+        try:
+            # 与命令行路径相同的宽松分析参数，用于处理不标准的裸流
+            with av.open(input_file, options={"analyzeduration": "20000000", "probesize": "20000000",
+                                              "fflags": "+genpts+igndts+discardcorrupt", "err_detect": "ignore_err"}) as in_container, \
+                    av.open(output_file, "w", format="mp4", options={"movflags": "faststart"}) as out_container:
+                in_stream = in_container.streams.video[0]
+                # 帧级+切片级多线程解码
+                in_stream.codec_context.thread_type = "AUTO"
+                rate = Fraction(self.config_manager.get_config("input_fps") or in_stream.average_rate or 25)
+                time_base = 1 / rate
                 
-                # 检查是否有重要的FFmpeg消息
-                if "frame=" in line or "size=" in line or "bitrate=" in line:
-                    logger.debug(f"FFmpeg输出: {line.strip()}")
+                out_stream = out_container.add_stream("libx264", rate=rate)
+                encoder = out_stream.codec_context
+                encoder.width = in_stream.codec_context.width
+                encoder.height = in_stream.codec_context.height
+                encoder.pix_fmt = "yuv420p"
+                encoder.time_base = time_base
+                encoder.thread_count = threads
+                encoder.thread_type = "AUTO"
+                encoder.options = {"crf": str(crf), "preset": self._x264_preset(), "profile": "main", "level": _H264_LEVEL}
                 
-                # 检查是否需要取消转码
-                if self.is_cancelled:
-                    process.terminate()
-                    logger.info(f"转码已取消: {input_file}")
-                    return False, "转码已取消"
+                frame_index = 0
+                for packet in in_container.demux(in_stream):
+                    if self.is_cancelled:
+                        logger.info(f"转码已取消: {input_file}")
+                        return False, "转码已取消"
+                    # 进程内转码没有子进程可挂起，直接阻塞等待恢复
+                    self._pause_event.wait()
+                    
+                    for frame in packet.decode():
+                        # 裸流的时间戳不可靠，按帧序号重新生成
+                        frame = frame.reformat(format="yuv420p")
+                        frame.pts = frame_index
+                        frame.time_base = time_base
+                        frame_index += 1
+                        out_container.mux(out_stream.encode(frame))
+                    
+                    if self.progress_callback:
+                        progress = max(0, min(100, frame_index * time_base / duration * 100))
+                        self.progress_callback(filename, progress)
                 
-                # 检查是否需要暂停转码
-                while self.is_paused:
-                    # 暂停时可以添加延迟，减少CPU占用
-                    import time
-                    time.sleep(0.1)
+                # 刷新编码器中缓存的帧
+                out_container.mux(out_stream.encode(None))
+        except Exception as e:
+            error_msg = f"PyAV转码失败: {str(e)}"
+            logger.error(f"转码失败: {input_file} -> {output_file}, {error_msg}")
+            return False, error_msg
+        
+        logger.info(f"转码成功(PyAV): {input_file} -> {output_file}")
+        if self.progress_callback:
+            self.progress_callback(filename, 100.0)
+        return True, ""
+    
+    def transcode_multi_output(self, input_file, outputs, include_audio=False):
+        """
+        一次FFmpeg调用将同一输入转码为多个分辨率，输入只解码一次
+        
+        Args:
+            input_file: 输入文件路径
+            outputs: (输出文件路径, 分辨率, crf)的列表，分辨率为"1280x720"形式的字符串或(宽, 高)元组
+            include_audio: 是否包含音频处理（默认False，保持原有行为）
+            
+        Returns:
+            tuple: (转码成功状态, 错误信息)
+        """
+        output_label = ", ".join(output_file for output_file, _, _ in outputs)
+        logger.info(f"开始多输出转码: {input_file} -> {output_label}")
+        
+        if not outputs:
+            error_msg = "输出列表为空"
+            logger.error(f"转码失败: {error_msg}")
+            return False, error_msg
+        
+        if not os.path.exists(input_file):
+            error_msg = f"输入文件不存在: {input_file}"
+            logger.error(f"转码失败: {error_msg}")
+            return False, error_msg
+        
+        for output_file, _, _ in outputs:
+            error_msg = self._ensure_output_dir(os.path.dirname(output_file))
+            if error_msg:
+                logger.error(f"转码失败: {error_msg}")
+                return False, error_msg
+        
+        duration = self._probe_duration(input_file)
+        self._current_duration = duration
+        command = self.build_multi_output_command(input_file, outputs, include_audio)
+        return self._run_transcode(command, input_file, output_label, duration)
+    
+    def build_multi_output_command(self, input_file, outputs, include_audio=False):
+        """
+        构建一个输入对应多个输出的FFmpeg命令，FFmpeg解码后在内部把帧分发给各输出的编码器
+        
+        Args:
+            input_file: 输入文件路径
+            outputs: (输出文件路径, 分辨率, crf)的列表
+            include_audio: 是否包含音频处理（默认False，保持原有行为）
+            
+        Returns:
+            list: FFmpeg命令列表
+        """
+        templates = self._ensure_templates()
+        hw_encoder, threads = templates.hw_encoder, templates.threads
+        
+        command = [*templates.input_flags, "-i", input_file]
+        for output_file, resolution, crf in outputs:
+            width, height = resolution.lower().split("x") if isinstance(resolution, str) else resolution
+            command.extend(["-map", "0:v:0"])
+            if include_audio:
+                command.extend(["-map", "0:a?"])
+            command.extend(self._video_filter_args(hw_encoder, (width, height)))
+            command.extend(self._video_codec_args(hw_encoder, crf, threads))
+            command.extend(templates.audio_flags_on if include_audio else templates.audio_flags_off)
+            command.extend(templates.encode_tail)
+            command.append(output_file)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"构建FFmpeg多输出命令: {' '.join(command)}")
+        return command
+    
+    def _run_transcode(self, command, input_file, output_file, duration=None):
+        """
+        执行FFmpeg转码命令并监控进度、暂停和取消
+        
+        Args:
+            command: FFmpeg命令列表
+            input_file: 输入文件路径，用于进度回调
+            output_file: 输出文件路径，用于日志
+            duration: 输入视频时长（秒），用于计算进度
+            
+        Returns:
+            tuple: (转码成功状态, 错误信息)
+        """
+        process = None
+        try:
+            # 执行FFmpeg命令，使用块缓冲读取输出，减少读取管道的系统调用
+            # 确保命令列表中的路径正确处理，尤其是带空格的路径
+            # subprocess会自动处理命令列表中的空格，不需要额外引号
+            process = subprocess.Popen(command, **self._popen_kwargs)
+            
+            self._track_process(process)
+            
+            # stdout只包含-progress记录，stderr由后台线程读取并保留尾部用于错误分析
+            stderr_thread, ffmpeg_output = _start_stderr_reader(process.stderr)
+            
+            # 读取FFmpeg进度输出，监控转码进度；管道由后台线程读取，回调较慢时FFmpeg不会被阻塞
+            for line in _progress_records(process.stdout):
+                # 暂停时FFmpeg进程已被挂起，读取线程阻塞等待恢复，不再轮询
+                self._pause_event.wait()
                 
                 # 提取转码进度
-                progress = self.extract_progress(line)
+                progress = self.extract_progress(line, duration)
                 if progress >= 0 and self.progress_callback:
                     # 调用进度回调函数
                     self.progress_callback(os.path.basename(input_file), progress)
-                
-                # 记录FFmpeg输出
-                logger.debug(f"FFmpeg输出: {line.strip()}")
             
             # 等待进程结束
             process.wait()
+            stderr_thread.join()
+            
+            # 取消时进程已被cancel()终止
+            if self.is_cancelled:
+                logger.info(f"转码已取消: {input_file}")
+                return False, "转码已取消"
             
             # 检查转码结果
             if process.returncode == 0:
                 logger.info(f"转码成功: {input_file} -> {output_file}")
-                logger.debug(f"转码完成输出:\n" + "\n".join(ffmpeg_output[-10:]))
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"转码完成输出:\n" + "\n".join(list(ffmpeg_output)[-10:]))
                 # 确保进度显示为100%
                 if self.progress_callback:
                     self.progress_callback(os.path.basename(input_file), 100.0)
                 return True, ""
             else:
                 # 分析错误原因，从FFmpeg输出中查找错误信息
-                error_lines = [line for line in ffmpeg_output if any(err in line.lower() for err in ["error", "failed", "could not", "unable to"])]
+                error_lines = [line for line in ffmpeg_output if _ERR_RE.search(line)]
                 error_msg = f"FFmpeg转码失败，返回码: {process.returncode}"
                 if error_lines:
                     # 添加最相关的错误信息
                     error_msg += f"\n错误详情: {error_lines[-1]}"
                 logger.error(f"转码失败: {input_file} -> {output_file}, {error_msg}")
                 # 记录详细的FFmpeg输出
-                logger.debug(f"FFmpeg详细输出:\n" + "\n".join(ffmpeg_output[-50:]))
+                logger.debug(f"FFmpeg详细输出:\n" + "\n".join(list(ffmpeg_output)[-50:]))
                 return False, error_msg
                 
         except subprocess.SubprocessError as e:
@@ -322,6 +1261,116 @@ class TranscodeEngine:
             error_msg = f"转码过程中发生异常: {str(e)}"
             logger.error(f"转码失败: {input_file} -> {output_file}, {error_msg}", exc_info=True)  # 记录完整堆栈
             return False, error_msg
+        finally:
+            self._untrack_process(process)
+    
+    def transcode_many(self, pairs, include_audio=False, max_workers=None, ffmpeg_threads=None):
+        """
+        使用多进程并行转码多个文件，每个子进程独立监控自己的FFmpeg，不受GIL影响
+        
+        Args:
+            pairs: (输入文件路径, 输出文件路径)的可迭代对象
+            include_audio: 是否包含音频处理（默认False，保持原有行为）
+            max_workers: 最大并行进程数，默认根据CPU核心数和ffmpeg_threads计算
+            ffmpeg_threads: 每个FFmpeg进程使用的线程数；默认在指定max_workers时按CPU核心数均分，否则为配置中的threads
+            
+        Returns:
+            list: 每个文件的(转码成功状态, 错误信息)，顺序与pairs一致
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return []
+        
+        # 并行进程数 × 每个FFmpeg的线程数 ≈ CPU核心数，避免过度订阅
+        if ffmpeg_threads is None:
+            if max_workers:
+                # 进程数已确定时，把CPU核心均分给各个FFmpeg进程
+                ffmpeg_threads = (os.cpu_count() or 1) // min(max_workers, len(pairs))
+            else:
+                ffmpeg_threads = self.config_manager.get_config("threads") or 4
+        ffmpeg_threads = max(1, int(ffmpeg_threads))
+        workers = max(1, (os.cpu_count() or 1) // ffmpeg_threads)
+        if max_workers:
+            workers = min(workers, max_workers)
+        workers = min(workers, len(pairs))
+        
+        # 子进程无法共享ConfigManager（含锁和定时器），传递配置快照
+        config = dict(self.config_manager.get_config())
+        config["threads"] = ffmpeg_threads
+        config["ffmpeg_path"] = self.ffmpeg_path
+        
+        logger.info(f"开始并行转码，共 {len(pairs)} 个文件，使用 {workers} 个进程，每个FFmpeg {ffmpeg_threads} 个线程")
+        
+        results = [None] * len(pairs)
+        # 使用spawn上下文，保证Windows和打包环境下的行为一致
+        mp_context = multiprocessing.get_context("spawn")
+        progress_queue = mp_context.Queue()
+        # 取消时通知子进程终止正在运行的FFmpeg，而不是等待其转码结束
+        cancel_event = mp_context.Event()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                                 initializer=_init_worker, initargs=(progress_queue, config, cancel_event)) as executor:
+            futures = {
+                executor.submit(_worker, (input_file, output_file, include_audio)): index
+                for index, (input_file, output_file) in enumerate(pairs)
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                self._drain_progress_queue(progress_queue)
+                
+                for future in done:
+                    index = futures[future]
+                    if future.cancelled():
+                        results[index] = (False, "转码已取消")
+                        continue
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        results[index] = (False, f"转码进程异常: {str(e)}")
+                
+                # 取消时不再启动尚未开始的任务，已在运行的任务由子进程终止其FFmpeg
+                if self.is_cancelled and not cancel_event.is_set():
+                    cancel_event.set()
+                    for future in pending:
+                        future.cancel()
+            
+            self._drain_progress_queue(progress_queue)
+        
+        success_count = sum(1 for success, _ in results if success)
+        logger.info(f"并行转码完成: {success_count}/{len(pairs)} 个文件成功")
+        return results
+    
+    def transcode_batch(self, input_files, output_dir, include_audio=False):
+        """
+        使用一个FFmpeg进程转码多个文件，每个文件仍输出为单独的MP4，适合大量短片段
+        
+        Args:
+            input_files: 输入文件列表
+            output_dir: 输出目录路径
+            include_audio: 是否包含音频处理（默认False，保持原有行为）
+        
+        Returns:
+            list: 每个文件的(转码成功状态, 错误信息)，顺序与input_files一致
+        """
+        with PersistentTranscoder(self, output_dir, include_audio) as transcoder:
+            for input_file in input_files:
+                transcoder.add(input_file)
+        return transcoder.results
+    
+    def _drain_progress_queue(self, progress_queue):
+        """
+        取出子进程上报的所有进度并转发给进度回调函数
+        
+        Args:
+            progress_queue: 子进程写入(文件名, 进度百分比)的队列
+        """
+        while True:
+            try:
+                filename, progress = progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            if self.progress_callback:
+                self.progress_callback(filename, progress)
     
     def get_output_filename(self, input_file, output_dir):
         """
@@ -334,17 +1383,50 @@ class TranscodeEngine:
         Returns:
             str: 输出文件路径
         """
-        # 获取输入文件名（不包含扩展名）
-        input_filename = os.path.basename(input_file)
-        name_without_ext = os.path.splitext(input_filename)[0]
+        # 获取输入文件名（不包含扩展名），直接做字符串切分，批量生成任务时省去basename和splitext的开销
+        path = os.fspath(input_file)
+        sep_index = path.rfind(os.sep)
+        if os.altsep:
+            sep_index = max(sep_index, path.rfind(os.altsep))
+        input_filename = path[sep_index + 1:]
+        dot_index = input_filename.rfind(".")
+        # 与splitext一致：以点开头的文件名不视为扩展名
+        name_without_ext = input_filename[:dot_index] if dot_index > 0 else input_filename
         
         # 生成输出文件名，保留原始时间戳信息
-        output_filename = f"{name_without_ext}.mp4"
-        output_file = os.path.join(output_dir, output_filename)
+        output_file = os.path.join(output_dir, name_without_ext + ".mp4")
         
-        logger.debug(f"生成输出文件名: {output_file}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"生成输出文件名: {output_file}")
         return output_file
     
+    def bulk_plan(self, input_dir, output_dir, file_extension=".v264"):
+        """
+        一次os.scandir生成目录中所有待转码文件的输出路径和文件大小
+        
+        文件大小来自目录项缓存的stat结果，调用方可据此按大小降序调度，先启动最大的文件以缩短并行转码的总耗时。
+        
+        Args:
+            input_dir: 输入目录路径（不递归子目录）
+            output_dir: 输出目录路径
+            file_extension: 要筛选的文件扩展名，默认为.v264，不区分大小写
+        
+        Returns:
+            list: (输入文件路径, 输出文件路径, 文件大小)的列表，顺序与目录项顺序一致
+        """
+        suffix = file_extension.lower()
+        plan = []
+        with os.scandir(input_dir) as it:
+            for entry in it:
+                name = entry.name
+                if not name.lower().endswith(suffix) or not entry.is_file():
+                    continue
+                # 与get_output_filename相同的命名规则：去掉扩展名，加上.mp4
+                dot_index = name.rfind(".")
+                stem = name[:dot_index] if dot_index > 0 else name
+                plan.append((entry.path, os.path.join(output_dir, stem + ".mp4"), entry.stat().st_size))
+        return plan
+    
     def get_merged_output_filename(self, output_dir):
         """
         生成合并后的输出文件名
@@ -356,7 +1438,6 @@ class TranscodeEngine:
             str: 合并后的输出文件路径
         """
         # 生成带时间戳的合并文件名
-        import datetime
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         output_filename = f"merged_{timestamp}.mp4"
         output_file = os.path.join(output_dir, output_filename)
@@ -364,7 +1445,112 @@ class TranscodeEngine:
         logger.debug(f"生成合并输出文件名: {output_file}")
         return output_file
     
-    def build_merge_command(self, input_files, output_file, include_audio=False):
+    def _probe_video_params(self, input_file):
+        """
+        使用ffprobe获取视频流的编码参数，结果按(路径, 修改时间, 文件大小)缓存
+        
+        Args:
+            input_file: 输入文件路径
+            
+        Returns:
+            str: 编码器、profile、像素格式和分辨率组成的参数字符串，若无法获取则返回None
+        """
+        try:
+            stat = os.stat(input_file)
+        except OSError:
+            return None
+        cache_key = (input_file, stat.st_mtime, stat.st_size)
+        if cache_key not in self._video_params_cache:
+            self._video_params_cache[cache_key] = self._probe_video_params_uncached(input_file)
+        return self._video_params_cache[cache_key]
+    
+    def _probe_video_params_uncached(self, input_file):
+        """
+        调用ffprobe获取视频流的编码参数
+        
+        Args:
+            input_file: 输入文件路径
+            
+        Returns:
+            str: 参数字符串，若无法获取则返回None
+        """
+        try:
+            result = subprocess.run(
+                [self.ffprobe_path, "-v", "error", "-select_streams", "v:0",
+                 "-show_entries", "stream=codec_name,profile,pix_fmt,width,height",
+                 "-of", "csv=p=0", input_file],
+                capture_output=True,
+                text=True,
+                timeout=_PROBE_TIMEOUT,
+                **_NO_WINDOW_KWARGS
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.debug(f"无法获取视频参数: {input_file}, {e}")
+            return None
+        params = result.stdout.strip()
+        return params if result.returncode == 0 and params else None
+    
+    def _can_stream_copy(self, input_files):
+        """
+        判断待合并的文件能否直接流复制：均为MP4或MPEG-TS且视频参数一致（如transcode_file的输出）
+        
+        Args:
+            input_files: 输入文件列表
+            
+        Returns:
+            bool: 是否可以使用-c copy合并
+        """
+        if not all(file.lower().endswith(_STREAM_COPY_EXTS) for file in input_files):
+            return False
+        
+        reference = None
+        for input_file in input_files:
+            params = self._probe_video_params(input_file)
+            if params is None:
+                # 无法确认参数一致时回退到重新编码，保证输出可用
+                return False
+            if reference is None:
+                reference = params
+            elif params != reference:
+                logger.info(f"待合并文件的视频参数不一致，使用重新编码合并: {input_file}")
+                return False
+        return True
+    
+    def _build_merge_templates(self, templates):
+        """
+        根据单文件转码的参数片段构建重新编码合并命令中与输入输出文件无关的参数片段
+        
+        Args:
+            templates: 当前配置对应的_CommandTemplates
+        
+        Returns:
+            tuple: (输入前参数, 视频编码参数, 输出参数)
+        """
+        crf = templates.crf
+        threads = templates.threads
+        # 启用GPU编码时合并同样使用硬件编码器；只转封装时单文件参数片段中没有编码器，这里单独获取
+        hw_encoder = self._active_hw_encoder()
+        
+        input_flags = [self.ffmpeg_path, *_PROGRESS_FLAGS, *_CONCAT_STDIN_FLAGS]
+        # 使用硬件解码，解码、编码全程在显存中完成
+        input_flags.extend(_HW_DECODE_FLAGS.get(hw_encoder, []))
+        # 与单文件转码使用相同的编码参数，包括线程数、预设和低延迟选项
+        video_flags = self._video_filter_args(hw_encoder) + self._video_codec_args(hw_encoder, crf, threads)
+        
+        tail = [
+            "-movflags", "faststart",  # 将元数据移到文件头部，支持拖动播放
+            "-profile:v", "main",  # 使用main profile确保兼容性
+        ]
+        if not hw_encoder:
+            # 硬件编码器自动选择级别；NVENC的输入帧位于显存，不能再转换像素格式
+            tail.extend([
+                "-level", _H264_LEVEL,  # 与单文件转码相同的级别，3.0不足以容纳720p60和1080p
+                "-pix_fmt", "yuv420p",  # 使用通用的YUV格式
+            ])
+        tail.append(templates.overwrite_flag)
+        return input_flags, video_flags, tail
+    
+    def build_merge_command(self, input_files, output_file, include_audio=False, stream_copy=False):
         """
         构建合并视频的FFmpeg命令
         
@@ -372,78 +1558,130 @@ class TranscodeEngine:
             input_files: 输入文件列表
             output_file: 输出文件路径
             include_audio: 是否包含音频处理（默认False，保持原有行为）
+            stream_copy: 是否直接复制流而不重新编码（输入参数一致时使用）
             
         Returns:
-            tuple: (FFmpeg命令列表, 临时文件列表路径)
+            tuple: (FFmpeg命令列表, 需要写入stdin的文件列表内容)
         """
-        # 创建文件列表文件
-        file_list_path = output_file + ".txt"
-        with open(file_list_path, 'w', encoding='utf-8') as f:
-            for file in input_files:
-                # 使用绝对路径，避免FFmpeg找不到文件
-                abs_path = os.path.abspath(file)
-                # 在Windows上使用双引号确保路径正确解析
-                f.write(f"file \"{abs_path}\"\n")
+        list_data = _concat_list(input_files)
+        templates = self._ensure_templates()
         
-        # 获取配置参数
-        overwrite = self.config_manager.get_config("overwrite")
-        video_codec = self.config_manager.get_config("video_codec")
-        crf = self.config_manager.get_config("crf")
-        audio_codec = self.config_manager.get_config("audio_codec")
-        audio_bitrate = self.config_manager.get_config("audio_bitrate")
+        if stream_copy:
+            # 输入已是参数一致的H.264 MP4/TS，直接复制流，合并只受磁盘I/O限制
+            command = [
+                self.ffmpeg_path,
+                *_PROGRESS_FLAGS,
+                *_CONCAT_STDIN_FLAGS,
+                "-i", "pipe:0",
+            ]
+            if include_audio:
+                command.extend(["-c", "copy"])
+                if any(file.lower().endswith(".ts") for file in input_files):
+                    # MPEG-TS中的AAC为ADTS格式，写入MP4前需要转换
+                    command.extend(["-bsf:a", "aac_adtstoasc"])
+            else:
+                command.extend(["-c:v", "copy", "-an"])
+            command.extend([
+                "-movflags", "faststart",  # 将元数据移到文件头部，支持拖动播放
+                templates.overwrite_flag,
+                output_file
+            ])
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"构建FFmpeg流复制合并命令: {' '.join(command)}")
+            return command, list_data
+        
+        # 合并参数片段与构建时依据的单文件参数片段一起整体发布，配置变化后自动重建
+        merge_templates = self._merge_templates
+        if merge_templates is None or merge_templates[0] is not templates:
+            merge_templates = (templates, self._build_merge_templates(templates))
+            self._merge_templates = merge_templates
+        input_flags, video_flags, tail = merge_templates[1]
         
         # 构建FFmpeg合并命令 - 确保合并后的视频支持拖动播放
         command = [
-            self.ffmpeg_path,
-            "-f", "concat",
-            "-safe", "0",
-            "-i", file_list_path,
-            "-c:v", "libx264",  # 使用标准h.264编码
-            "-preset", "fast",
-            "-crf", str(crf),
+            *input_flags,
+            "-i", "pipe:0",
+            *video_flags,
+            # 根据include_audio参数决定是否处理音频，音频参数与单文件转码相同
+            *(templates.audio_flags_on if include_audio else templates.audio_flags_off),
+            *tail,
+            output_file
         ]
         
-        # 根据include_audio参数决定是否处理音频
-        if include_audio:
-            # 音频处理参数
-            command.extend([
-                "-c:a", audio_codec,  # 使用配置的音频编码器
-                "-b:a", audio_bitrate,  # 使用配置的音频比特率
-            ])
-        else:
-            # 保持原有行为，禁用音频流
-            command.append("-an")  # 禁用音频流
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"构建FFmpeg合并命令: {' '.join(command)}")
+        return command, list_data
+    
+    def build_transcode_merge_command(self, input_files, output_file, include_audio=False):
+        """
+        构建直接将多个原始.v264文件转码并合并为一个MP4的FFmpeg命令
         
-        # 继续添加其他参数
-        command.extend([
-            "-movflags", "faststart",  # 将元数据移到文件头部，支持拖动播放
-            "-profile:v", "main",  # 使用main profile确保兼容性
-            "-level", "3.0",  # 视频级别，确保广泛兼容
-            "-pix_fmt", "yuv420p",  # 使用通用的YUV格式
-            "-y" if overwrite else "-n",
-            output_file
-        ])
+        Args:
+            input_files: 原始输入文件列表
+            output_file: 输出文件路径
+            include_audio: 是否包含音频处理（默认False，保持原有行为）
+            
+        Returns:
+            tuple: (FFmpeg命令列表, 需要写入stdin的文件列表内容)
+        """
+        # 复用单文件转码的全部参数，只把输入换成concat分离器从stdin读取的文件列表
+        command = self.build_ffmpeg_command("pipe:0", output_file, include_audio)
+        input_index = command.index("-i")
+        command[input_index:input_index] = _CONCAT_STDIN_FLAGS
         
-        logger.debug(f"构建FFmpeg合并命令: {' '.join(command)}")
-        return command, file_list_path
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"构建FFmpeg转码合并命令: {' '.join(command)}")
+        return command, _concat_list(input_files)
     
-    def merge_videos(self, input_files, output_file, include_audio=False):
+    def merge_videos(self, input_files, output_file, include_audio=False, progress_name=None):
         """
-        合并多个视频文件
+        合并多个视频文件，参数一致的MP4直接流复制，否则重新编码
         
         Args:
             input_files: 输入文件列表
             output_file: 输出文件路径
             include_audio: 是否包含音频处理（默认False，保持原有行为）
+            progress_name: 通过进度回调上报合并进度时使用的名称，默认为输出文件名
+            
+        Returns:
+            tuple: (合并成功状态, 错误信息)
+        """
+        return self._concat_videos(input_files, output_file, include_audio, raw_input=False,
+                                   progress_name=progress_name)
+    
+    def transcode_and_merge(self, input_files, output_file, include_audio=False, progress_name=None):
+        """
+        将多个原始.v264文件在一次FFmpeg调用中转码并合并，只编码一次
+        
+        Args:
+            input_files: 原始输入文件列表
+            output_file: 输出文件路径
+            include_audio: 是否包含音频处理（默认False，保持原有行为）
+            progress_name: 通过进度回调上报进度时使用的名称，默认为输出文件名
+            
+        Returns:
+            tuple: (转码合并成功状态, 错误信息)
+        """
+        return self._concat_videos(input_files, output_file, include_audio, raw_input=True,
+                                   progress_name=progress_name)
+    
+    def _concat_videos(self, input_files, output_file, include_audio, raw_input, progress_name=None):
+        """
+        使用concat分离器合并多个视频文件
+        
+        Args:
+            input_files: 输入文件列表
+            output_file: 输出文件路径
+            include_audio: 是否包含音频处理
+            raw_input: 输入是否为原始.v264文件（需要转码），否则为待合并的MP4
+            progress_name: 上报进度时使用的名称，为None时使用输出文件名
             
         Returns:
             tuple: (合并成功状态, 错误信息)
         """
         logger.info(f"开始合并视频文件，共 {len(input_files)} 个文件 -> {output_file} (音频处理: {'启用' if include_audio else '禁用'})")
         
-        # 重置状态
-        self.reset()
-        file_list_path = None
+        process = None
         
         # 检查输入文件列表是否为空
         if not input_files:
@@ -452,16 +1690,18 @@ class TranscodeEngine:
             return False, error_msg
         
         # 检查所有输入文件是否存在和文件大小
+        # 按目录批量获取文件大小，避免对每个文件分别调用exists和getsize
+        sizes = _file_sizes(input_files)
         valid_files = []
         invalid_files = []
         for input_file in input_files:
-            if os.path.exists(input_file):
-                if os.path.getsize(input_file) > 0:
-                    valid_files.append(input_file)
-                else:
-                    invalid_files.append(f"{input_file} (文件大小为0)")
-            else:
+            size = sizes[input_file]
+            if size is None:
                 invalid_files.append(f"{input_file} (文件不存在)")
+            elif size > 0:
+                valid_files.append(input_file)
+            else:
+                invalid_files.append(f"{input_file} (文件大小为0)")
         
         if invalid_files:
             error_msg = f"合并失败: 以下文件无效:\n" + "\n".join(invalid_files)
@@ -469,72 +1709,68 @@ class TranscodeEngine:
             return False, error_msg
         
         # 检查输出目录是否存在
-        output_dir = os.path.dirname(output_file)
-        if output_dir and not os.path.exists(output_dir):
-            try:
-                os.makedirs(output_dir, exist_ok=True)
-                logger.info(f"创建输出目录: {output_dir}")
-            except Exception as e:
-                error_msg = f"无法创建输出目录: {output_dir}, {str(e)}"
-                logger.error(f"合并失败: {error_msg}")
-                return False, error_msg
+        error_msg = self._ensure_output_dir(os.path.dirname(output_file))
+        if error_msg:
+            logger.error(f"合并失败: {error_msg}")
+            return False, error_msg
         
         try:
             # 构建FFmpeg合并命令
-            command, file_list_path = self.build_merge_command(valid_files, output_file, include_audio)
+            if raw_input:
+                command, list_data = self.build_transcode_merge_command(valid_files, output_file, include_audio)
+            else:
+                stream_copy = self._can_stream_copy(valid_files)
+                command, list_data = self.build_merge_command(valid_files, output_file, include_audio, stream_copy)
             
-            # 执行FFmpeg命令，使用更低的bufsize并禁用输出缓冲
+            # 执行FFmpeg命令，使用块缓冲读取输出，减少读取管道的系统调用
             # 确保命令列表中的路径正确处理，尤其是带空格的路径
             # subprocess会自动处理命令列表中的空格，不需要额外引号
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                encoding='utf-8',
-                errors='ignore',
-                bufsize=0,  # 无缓冲模式
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
+            process = subprocess.Popen(command, **self._popen_stdin_kwargs)
+            self._track_process(process)
             
-            # 读取FFmpeg输出并保存以供错误分析
-            output_lines = []
-            for line in iter(process.stdout.readline, ''):
-                line_content = line.strip()
-                output_lines.append(line_content)
-                
-                # 检查是否需要取消合并
-                if self.is_cancelled:
-                    process.terminate()
-                    logger.info(f"视频合并已取消")
-                    return False, "视频合并已取消"
-                
-                # 检查是否需要暂停合并
-                while self.is_paused:
-                    # 暂停时可以添加延迟，减少CPU占用
-                    import time
-                    time.sleep(0.1)
+            # stdout只包含-progress记录；stderr由后台线程读取，只保留尾部以供错误分析
+            # 先开始读取stderr，列表很长时FFmpeg也不会因stderr写满而无法读取stdin
+            stderr_thread, output_lines = _start_stderr_reader(process.stderr)
+            
+            # 文件列表通过stdin传入，concat分离器读到EOF后开始处理
+            _write_concat_list(process, list_data)
+            
+            # 有进度回调时按各输入时长之和计算合并进度，时长已按文件缓存
+            total_duration = None
+            if self.progress_callback:
+                durations = [self._probe_duration(file) for file in valid_files]
+                if all(durations):
+                    total_duration = sum(durations)
+            output_name = progress_name or os.path.basename(output_file)
+            
+            for line in _progress_records(process.stdout):
+                # 暂停时FFmpeg进程已被挂起，读取线程阻塞等待恢复
+                self._pause_event.wait()
                 
-                # 只记录重要的FFmpeg输出信息，避免日志过大
-                if any(keyword in line_content.lower() for keyword in ["frame", "size", "bitrate", "error", "failed", "warning"]):
-                    logger.debug(f"FFmpeg合并输出: {line_content}")
+                if self.progress_callback:
+                    progress = self.extract_progress(line, total_duration)
+                    if progress >= 0:
+                        self.progress_callback(output_name, progress)
             
             # 等待进程结束
             process.wait()
+            stderr_thread.join()
             
-            # 删除临时文件列表
-            if os.path.exists(file_list_path):
-                os.remove(file_list_path)
+            # 取消时进程已被cancel()终止
+            if self.is_cancelled:
+                logger.info(f"视频合并已取消")
+                return False, "视频合并已取消"
             
             # 检查合并结果
             if process.returncode == 0 and os.path.exists(output_file):
                 file_size = os.path.getsize(output_file)
                 logger.info(f"视频合并成功: {output_file} (文件大小: {file_size/1024/1024:.2f} MB)")
-                logger.debug(f"合并完成输出:\n" + "\n".join(output_lines[-10:]))
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"合并完成输出:\n" + "\n".join(list(output_lines)[-10:]))
                 return True, ""
             else:
                 # 分析错误原因
-                error_lines = [line for line in output_lines if any(err in line.lower() for err in ["error", "failed", "could not", "unable to"])]
+                error_lines = [line for line in output_lines if _ERR_RE.search(line)]
                 error_msg = f"FFmpeg返回错误码: {process.returncode}"
                 if error_lines:
                     error_msg += f"\n错误详情: {error_lines[-1]}"
@@ -544,7 +1780,7 @@ class TranscodeEngine:
                     error_msg += f"\n输出文件已创建但可能不完整: {output_file}"
                 
                 logger.error(f"视频合并失败: {output_file}, {error_msg}")
-                logger.debug(f"FFmpeg合并详细输出:\n" + "\n".join(output_lines[-50:]))
+                logger.debug(f"FFmpeg合并详细输出:\n" + "\n".join(list(output_lines)[-50:]))
                 return False, error_msg
                 
         except subprocess.SubprocessError as e:
@@ -566,10 +1802,354 @@ class TranscodeEngine:
             logger.error(f"视频合并失败: {output_file}, {error_msg}", exc_info=True)  # 记录完整堆栈
             return False, error_msg
         finally:
-            # 确保临时文件被清理
-            if file_list_path and os.path.exists(file_list_path):
-                try:
-                    os.remove(file_list_path)
-                    logger.debug(f"已删除临时文件列表: {file_list_path}")
-                except Exception as e:
-                    logger.warning(f"无法删除临时文件列表: {file_list_path}, {str(e)}")
\ No newline at end of file
+            self._untrack_process(process)
+
+
+class PersistentTranscoder:
+    """
+    持久化转码器，使用一个FFmpeg进程转码多个文件，省去每个短文件重复启动进程和初始化编解码器的开销
+    
+    FFmpeg通过concat分离器从stdin读取文件列表，再由segment封装器在每个输入的边界处拆分输出。
+    concat分离器在打开时会读取完整列表，因此文件在退出上下文（或调用run）时一次性写入stdin。
+    
+    用法:
+        with PersistentTranscoder(engine, output_dir) as transcoder:
+            for input_file in files:
+                transcoder.add(input_file)
+        results = transcoder.results
+    """
+    
+    def __init__(self, engine, output_dir, include_audio=False):
+        """
+        初始化持久化转码器
+        
+        Args:
+            engine: TranscodeEngine实例，提供命令参数、时长探测和暂停/取消状态
+            output_dir: 输出目录路径
+            include_audio: 是否包含音频处理（默认False，保持原有行为）
+        """
+        self.engine = engine
+        self.output_dir = output_dir
+        self.include_audio = include_audio
+        self.jobs = []
+        self.results = []
+        self.process = None
+        # 一个持久化转码器对应一批任务，在创建时重置一次引擎状态；
+        # run中不再重置，创建之后、run之前到达的取消不会被清除
+        engine.reset()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.run()
+        elif self.process and self.process.poll() is None:
+            self.process.terminate()
+        return False
+    
+    def add(self, input_file):
+        """
+        添加待转码的文件
+        
+        Args:
+            input_file: 输入文件路径
+            
+        Returns:
+            str: 该文件对应的输出文件路径
+        """
+        output_file = self.engine.get_output_filename(input_file, self.output_dir)
+        # 拆分输出需要事先知道每个输入的时长
+        duration = self.engine._probe_duration(input_file)
+        self.jobs.append((input_file, output_file, duration))
+        return output_file
+    
+    def build_command(self, segment_pattern, boundaries):
+        """
+        构建从stdin读取文件列表并按输入边界拆分输出的FFmpeg命令
+        
+        Args:
+            segment_pattern: segment封装器的输出文件名模式
+            boundaries: 各输入（最后一个除外）结束时刻的累计时间（秒）
+            
+        Returns:
+            list: FFmpeg命令列表
+        """
+        command = self.engine.build_ffmpeg_command("pipe:0", segment_pattern, self.include_audio)
+        input_index = command.index("-i")
+        command[input_index:input_index] = _CONCAT_STDIN_FLAGS
+        
+        # segment封装器不识别mp4的-movflags，改为通过segment_format_options传递
+        movflags_index = command.index("-movflags")
+        del command[movflags_index:movflags_index + 2]
+        
+        segment_times = ",".join(f"{boundary:.3f}" for boundary in boundaries)
+        command[-1:] = [
+            "-f", "segment",
+            "-segment_times", segment_times,
+            "-force_key_frames", segment_times,  # 在拆分点强制关键帧，保证每段从关键帧开始
+            "-reset_timestamps", "1",
+            "-segment_format", "mp4",
+            "-segment_format_options", "movflags=+faststart",
+            segment_pattern
+        ]
+        return command
+    
+    def run(self):
+        """
+        启动FFmpeg转码所有已添加的文件
+        
+        Returns:
+            list: 每个文件的(转码成功状态, 错误信息)，顺序与添加顺序一致
+        """
+        if not self.jobs:
+            return self.results
+        
+        # 只有已知时长的文件才能确定拆分点，这些文件共用一个FFmpeg进程，其余文件逐个转码
+        batch = [index for index, (_, _, duration) in enumerate(self.jobs) if duration is not None]
+        if len(batch) < 2:
+            batch = []
+        results = [None] * len(self.jobs)
+        if batch and not self.engine.is_cancelled:
+            for index, result in zip(batch, self._run_batch([self.jobs[index] for index in batch])):
+                results[index] = result
+        
+        if len(batch) < len(self.jobs):
+            logger.info(f"{len(self.jobs) - len(batch)} 个文件无法获取时长，逐个启动FFmpeg转码")
+        for index, (input_file, output_file, _) in enumerate(self.jobs):
+            if results[index] is not None:
+                continue
+            # 取消状态在整批任务中保持，取消后（包括run开始之前的取消）不再开始新的文件
+            if self.engine.is_cancelled:
+                results[index] = (False, "转码已取消")
+            else:
+                results[index] = self.engine.transcode_file(input_file, output_file, self.include_audio)
+        
+        self.results = results
+        return self.results
+    
+    def _run_batch(self, jobs):
+        """
+        使用一个FFmpeg进程转码一组已知时长的文件
+        
+        Args:
+            jobs: (输入文件路径, 输出文件路径, 时长)的列表
+            
+        Returns:
+            list: 每个文件的(转码成功状态, 错误信息)，顺序与jobs一致
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        boundaries = []
+        elapsed = 0.0
+        for _, _, duration in jobs:
+            elapsed += duration
+            boundaries.append(elapsed)
+        
+        # 每批使用唯一的分段文件名前缀，同一输出目录中的多个批次或转码器不会互相覆盖分段文件
+        segment_prefix = f".segment_{uuid.uuid4().hex}_"
+        # 只有文件名部分包含%03d，目录中的%需转义为%%后才能交给segment封装器
+        segment_pattern = os.path.join(self.output_dir.replace("%", "%%"), f"{segment_prefix}%03d.mp4")
+        command = self.build_command(segment_pattern, boundaries[:-1])
+        logger.info(f"开始持久化转码，共 {len(jobs)} 个文件，使用1个FFmpeg进程")
+        
+        success, error_msg = self._run_process(command, jobs, boundaries)
+        return [self._finish_segment(os.path.join(self.output_dir, f"{segment_prefix}{index:03d}.mp4"),
+                                     input_file, output_file, success, error_msg)
+                for index, (input_file, output_file, _) in enumerate(jobs)]
+    
+    def _run_process(self, command, jobs, boundaries):
+        """
+        启动FFmpeg进程并登记到引擎，使暂停时该进程同样被挂起
+        
+        Args:
+            command: FFmpeg命令列表
+            jobs: 该进程转码的(输入文件路径, 输出文件路径, 时长)列表
+            boundaries: 各输入结束时刻的累计时间（秒）
+            
+        Returns:
+            tuple: (转码成功状态, 错误信息)
+        """
+        engine = self.engine
+        try:
+            self.process = subprocess.Popen(command, **engine._popen_stdin_kwargs)
+        except (OSError, subprocess.SubprocessError) as e:
+            error_msg = f"FFmpeg进程错误: {str(e)}"
+            logger.error(f"持久化转码失败: {error_msg}")
+            return False, error_msg
+        
+        process = self.process
+        engine._track_process(process)
+        try:
+            return self._monitor_process(process, jobs, boundaries)
+        finally:
+            engine._untrack_process(process)
+    
+    def _monitor_process(self, process, jobs, boundaries):
+        """
+        向FFmpeg写入文件列表，读取进度输出直到进程结束
+        
+        Args:
+            process: FFmpeg进程
+            jobs: 该进程转码的(输入文件路径, 输出文件路径, 时长)列表
+            boundaries: 各输入结束时刻的累计时间（秒）
+            
+        Returns:
+            tuple: (转码成功状态, 错误信息)
+        """
+        engine = self.engine
+        stderr_thread, ffmpeg_output = _start_stderr_reader(process.stderr)
+        _write_concat_list(process, _concat_list(input_file for input_file, _, _ in jobs))
+        
+        current = 0
+        for line in _progress_records(process.stdout):
+            # 暂停时FFmpeg进程由引擎挂起，这里阻塞等待恢复
+            engine._pause_event.wait()
+            
+            position = _parse_out_time(line)
+            if position is not None and engine.progress_callback:
+                # 越过边界的文件已转码完成
+                while current < len(boundaries) - 1 and position >= boundaries[current]:
+                    engine.progress_callback(os.path.basename(jobs[current][0]), 100.0)
+                    current += 1
+                start = boundaries[current - 1] if current else 0.0
+                duration = boundaries[current] - start
+                progress = max(0, min(100, (position - start) / duration * 100))
+                engine.progress_callback(os.path.basename(jobs[current][0]), progress)
+        
+        process.wait()
+        stderr_thread.join()
+        # 取消时进程已被引擎终止
+        if engine.is_cancelled:
+            logger.info("持久化转码已取消")
+            return False, "转码已取消"
+        if process.returncode != 0:
+            error_msg = f"FFmpeg转码失败，返回码: {process.returncode}"
+            logger.error(f"持久化转码失败: {error_msg}")
+            logger.debug(f"FFmpeg详细输出:\n" + "\n".join(list(ffmpeg_output)[-50:]))
+            return False, error_msg
+        return True, ""
+    
+    def _finish_segment(self, segment_file, input_file, output_file, success, error_msg):
+        """
+        将拆分出的片段移动为最终输出文件
+        
+        Args:
+            segment_file: segment封装器生成的片段文件
+            input_file: 对应的输入文件路径
+            output_file: 最终输出文件路径
+            success: FFmpeg是否成功结束
+            error_msg: FFmpeg失败时的错误信息
+            
+        Returns:
+            tuple: (转码成功状态, 错误信息)
+        """
+        if not success:
+            if os.path.exists(segment_file):
+                os.remove(segment_file)
+            return False, error_msg
+        
+        if not os.path.exists(segment_file):
+            return False, f"未生成输出片段: {segment_file}"
+        
+        if os.path.exists(output_file) and not self.engine.config_manager.get_config("overwrite"):
+            os.remove(segment_file)
+            return False, f"输出文件已存在: {output_file}"
+        
+        os.replace(segment_file, output_file)
+        if self.engine.progress_callback:
+            self.engine.progress_callback(os.path.basename(input_file), 100.0)
+        logger.info(f"转码成功: {output_file}")
+        return True, ""
+
+
+class _ConfigSnapshot:
+    """
+    只读配置快照，提供与ConfigManager相同的get_config接口，供子进程中的转码引擎使用
+    """
+    
+    def __init__(self, config):
+        """
+        初始化配置快照
+        
+        Args:
+            config: 配置字典
+        """
+        self.config = config
+        # 快照不可修改，版本号固定
+        self.version = 0
+    
+    def get_config(self, key=None):
+        """
+        获取配置值
+        
+        Args:
+            key: 配置项名称，若为None则返回所有配置
+            
+        Returns:
+            配置值或配置字典
+        """
+        if key is None:
+            return self.config
+        return self.config.get(key)
+
+
+# 子进程中用于上报进度的队列，由_init_worker在进程启动时设置
+_worker_progress_queue = None
+
+# 子进程中的转码引擎，由_init_worker创建并在该进程的所有任务中复用，收到取消通知时由监视线程调用其cancel()
+_worker_engine = None
+
+# 主进程的取消事件，已取消时子进程不再开始新的转码
+_worker_cancel_event = None
+
+
+def _watch_cancel(cancel_event):
+    """
+    在子进程中等待主进程的取消通知，取消当前及之后的转码
+    
+    Args:
+        cancel_event: 主进程设置的多进程事件
+    """
+    cancel_event.wait()
+    engine = _worker_engine
+    if engine is not None:
+        engine.cancel()
+
+
+def _init_worker(progress_queue, config, cancel_event=None):
+    """
+    转码子进程初始化函数，创建该进程复用的转码引擎，硬件编码器检测和参数片段构建每个进程只进行一次
+    
+    Args:
+        progress_queue: 用于上报(文件名, 进度百分比)的多进程队列
+        config: 主进程的配置快照字典
+        cancel_event: 主进程取消时设置的多进程事件，可以为None
+    """
+    global _worker_progress_queue, _worker_cancel_event, _worker_engine
+    _worker_progress_queue = progress_queue
+    _worker_cancel_event = cancel_event
+    engine = TranscodeEngine(_ConfigSnapshot(config))
+    if progress_queue is not None:
+        engine.set_progress_callback(lambda filename, progress: progress_queue.put((filename, progress)))
+    # 先设置引擎再启动监视线程，取消通知到达时总有引擎可以取消
+    _worker_engine = engine
+    if cancel_event is not None:
+        # 每个子进程只启动一个监视线程，在进程的整个生命周期内复用
+        threading.Thread(target=_watch_cancel, args=(cancel_event,), daemon=True).start()
+
+
+def _worker(args):
+    """
+    转码子进程执行函数，使用该进程的转码引擎转码单个文件
+    
+    Args:
+        args: (输入文件路径, 输出文件路径, 是否包含音频处理)
+        
+    Returns:
+        tuple: (转码成功状态, 错误信息)
+    """
+    input_file, output_file, include_audio = args
+    # 引擎在取消后保持取消状态，之后启动的FFmpeg进程也会被立即结束；这里只是省去无谓的启动
+    if _worker_engine.is_cancelled or (_worker_cancel_event is not None and _worker_cancel_event.is_set()):
+        return False, "转码已取消"
+    return _worker_engine.transcode_file(input_file, output_file, include_audio)
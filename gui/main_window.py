@@ -5,18 +5,49 @@
 负责创建和管理应用程序的主界面
 """
 
+import functools
 import os
+import queue
+import threading
+import time
 import tkinter as tk
+from collections import deque
 from tkinter import ttk, filedialog, messagebox
 # 修改导入方式，使用绝对导入
 from core.file_manager import FileManager
-from core.config_manager import ConfigManager
+from core.config_manager import get_config_manager
 from core.transcode_engine import TranscodeEngine
 from core.task_manager import TaskManager
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 主线程处理进度队列的间隔（毫秒）
+_PROGRESS_POLL_MS = 50
+
+# 日志文本框保留的最大行数，更早的日志仍保存在日志文件中
+_LOG_MAX_LINES = 5000
+
+# 日志文本框中消息时间戳的格式
+_LOG_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 合并进度在进度队列中使用的名称，与转码文件名区分，由合并进度条显示
+_MERGE_PROGRESS_KEY = "__merge__"
+
+
+@functools.lru_cache(maxsize=1024)
+def _format_pct(progress):
+    """
+    将进度格式化为百分比文本，进度已保留一位小数，取值有限，结果可缓存复用
+    
+    Args:
+        progress: 保留一位小数的进度百分比
+        
+    Returns:
+        str: 百分比文本，如"12.5%"
+    """
+    return f"{progress:.1f}%"
+
 
 class MainWindow:
     """
@@ -36,32 +67,52 @@ class MainWindow:
         self.root.resizable(True, True)
         
         # 初始化核心组件
-        self.config_manager = ConfigManager()
+        self.config_manager = get_config_manager()
         self.file_manager = FileManager()
         self.transcode_engine = TranscodeEngine(self.config_manager)
-        self.task_manager = TaskManager(self.transcode_engine, self.config_manager.get_config("threads"))
+        threads = self.config_manager.get_config("threads")
+        self.task_manager = TaskManager(self.transcode_engine, threads, ffmpeg_threads=threads)
         
         # 设置转码引擎的进度回调
         self.transcode_engine.set_progress_callback(self.update_task_progress)
         
-        # 设置任务管理器的回调函数
-        self.task_manager.set_completion_callback(self.on_transcode_completed)
+        # 设置任务管理器的回调函数，完成回调在工作线程中触发，转到主线程执行
+        self.task_manager.set_completion_callback(self._on_tasks_finished)
         # 设置任务管理器的进度回调函数
         self.task_manager.set_progress_callback(self.update_task_progress)
         
         # 初始化变量
         self.source_dir = tk.StringVar(value=self.config_manager.get_config("source_dir"))
         self.output_dir = tk.StringVar(value=self.config_manager.get_config("output_dir"))
-        self.merge_videos = tk.BooleanVar(value=False)
+        self.merge_videos_var = tk.BooleanVar(value=False)
         self.include_audio = tk.BooleanVar(value=self.config_manager.get_config("include_audio") or False)
+        self.use_gpu = tk.BooleanVar(value=self.config_manager.get_config("use_gpu") or False)
         self.video_files = []
         self.selected_video_files_count = 0
+        # 文件名到表格行ID的索引，进度更新时直接定位行，无需遍历整个表格
+        self._tree_items = {}
+        # 每行当前显示的状态，状态未变化时不再重复写入表格
+        self._row_status = {}
+        # 每行当前显示的进度文本，进度文本未变化时不再重复写入表格
+        self._last_pct = {}
+        # 与video_files一一对应的文件名，扫描时计算一次
+        self._basenames = []
+        # 后台扫描是否正在进行，进行中不再启动新的扫描，避免两次扫描同时修改文件管理器
+        self._scan_in_progress = False
+        # 工作线程上报的(文件名, 进度)队列，由主线程定时取出后统一更新界面；
+        # 文件名为None的条目是需要在主线程中执行的(函数, 参数)
+        self._progress_queue = queue.Queue()
+        # 待写入日志文本框的消息，由进度处理循环在主线程中批量写入
+        self._log_buffer = deque()
         
         # 创建界面组件
         self.create_widgets()
         
-        # 扫描默认目录
-        self.scan_directory()
+        # 窗口绘制完成后再在后台线程中扫描默认目录，避免目录较慢时阻塞窗口显示
+        self.root.after_idle(self._async_initial_scan)
+        
+        # 启动进度队列的处理循环
+        self.root.after(_PROGRESS_POLL_MS, self._drain_progress)
     
     def create_widgets(self):
         """
@@ -86,7 +137,8 @@ class MainWindow:
         ttk.Button(config_frame, text="浏览", command=self.browse_output_dir).grid(row=1, column=2, padx=5, pady=5)
         
         # 扫描按钮
-        ttk.Button(config_frame, text="扫描目录", command=self.scan_directory).grid(row=0, column=3, rowspan=2, padx=5, pady=5)
+        self.scan_btn = ttk.Button(config_frame, text="扫描目录", command=self.scan_directory)
+        self.scan_btn.grid(row=0, column=3, rowspan=2, padx=5, pady=5)
         
         # 2. 中间操作区域
         operation_frame = ttk.Frame(main_frame)
@@ -113,12 +165,16 @@ class MainWindow:
         options_frame.pack(side=tk.RIGHT, padx=5)
         
         # 合并视频选项
-        ttk.Checkbutton(options_frame, text="合并为一个视频", variable=self.merge_videos).pack(side=tk.RIGHT, padx=5)
+        ttk.Checkbutton(options_frame, text="合并为一个视频", variable=self.merge_videos_var).pack(side=tk.RIGHT, padx=5)
         
         # 音频处理选项
         ttk.Checkbutton(options_frame, text="包含音频处理", variable=self.include_audio, 
                        command=self.on_include_audio_changed).pack(side=tk.RIGHT, padx=5)
         
+        # GPU编码选项
+        ttk.Checkbutton(options_frame, text="GPU加速编码", variable=self.use_gpu,
+                       command=self.on_use_gpu_changed).pack(side=tk.RIGHT, padx=5)
+        
         # 3. 转码文件列表
         file_list_frame = ttk.LabelFrame(main_frame, text="转码文件列表", padding="10")
         file_list_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
@@ -156,6 +212,14 @@ class MainWindow:
         self.progress_label = ttk.Label(progress_frame, text="0/0 个文件")
         self.progress_label.pack(side=tk.RIGHT, padx=5)
         
+        # 合并进度条，合并视频模式下显示合并阶段的进度
+        merge_progress_frame = ttk.Frame(main_frame)
+        merge_progress_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(merge_progress_frame, text="合并进度:").pack(side=tk.LEFT, padx=5)
+        self.merge_progress = ttk.Progressbar(merge_progress_frame, orient=tk.HORIZONTAL, length=200, mode="determinate")
+        self.merge_progress.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        
         # 5. 日志区域
         log_frame = ttk.LabelFrame(main_frame, text="日志", padding="10")
         log_frame.pack(fill=tk.BOTH, expand=True)
@@ -169,6 +233,16 @@ class MainWindow:
         self.log_text.configure(yscroll=log_scrollbar.set)
         log_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
     
+    def on_use_gpu_changed(self):
+        """
+        GPU加速编码选项变化时的回调函数
+        """
+        # 保存配置
+        self.config_manager.set_config("use_gpu", self.use_gpu.get())
+        
+        if self.use_gpu.get():
+            self.log_message("已启用GPU加速编码，未检测到可用的硬件编码器时将自动使用CPU编码")
+    
     def on_include_audio_changed(self):
         """
         音频处理选项变化时的回调函数
@@ -211,82 +285,204 @@ class MainWindow:
         """
         扫描目录下的视频文件
         """
+        if self._scan_in_progress:
+            self.log_message("正在扫描目录，请稍候...")
+            return
         self.log_message("开始扫描目录...")
         
-        # 清空文件列表
-        self.file_tree.delete(*self.file_tree.get_children())
-        self.video_files = []
-        
         # 扫描目录
         source_dir = self.source_dir.get()
-        if os.path.exists(source_dir):
-            self.video_files = self.file_manager.scan_directory(source_dir)
-            # 按时间戳排序
-            self.video_files = self.file_manager.sort_files_by_timestamp()
-            
-            # 更新文件列表
-            self.update_file_list()
+        self._apply_scan_result(source_dir, self._scan_worker(source_dir))
+    
+    def _async_initial_scan(self):
+        """
+        在后台线程中扫描默认目录，扫描结果经进度队列交回主线程更新界面
+        """
+        self.log_message("开始扫描目录...")
+        source_dir = self.source_dir.get()
+        # 扫描结果交回主线程之前禁用扫描按钮
+        self._scan_in_progress = True
+        self.scan_btn.config(state=tk.DISABLED)
+        
+        def run():
+            try:
+                result = self._scan_worker(source_dir)
+            except Exception as e:
+                logger.error(f"扫描目录失败: {e}", exc_info=True)
+                result = None
+            self._progress_queue.put((None, (self._finish_async_scan, (source_dir, result))))
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def _finish_async_scan(self, source_dir, result):
+        """
+        在主线程中应用后台扫描的结果并重新启用扫描按钮
+        
+        Args:
+            source_dir: 扫描的源目录
+            result: _scan_worker的返回值
+        """
+        self._scan_in_progress = False
+        self.scan_btn.config(state=tk.NORMAL)
+        self._apply_scan_result(source_dir, result)
+    
+    def _scan_worker(self, source_dir):
+        """
+        扫描并排序源目录下的视频文件，只访问文件管理器，可在任意线程中调用
+        
+        Args:
+            source_dir: 源目录
             
-            self.log_message(f"扫描完成，共找到 {len(self.video_files)} 个.v264文件")
-        else:
+        Returns:
+            tuple: (排序后的视频文件列表, 对应的文件名列表)，源目录不存在时返回None
+        """
+        if not os.path.exists(source_dir):
+            return None
+        # 边扫描边提取时间戳，直接交给排序，不再先构建完整的中间列表
+        paths = self.file_manager.sort_files_by_timestamp(
+            self.file_manager.iter_files(source_dir)
+        )
+        # 同时返回本次扫描的文件名，主线程不再从文件管理器读取可能已被其他扫描替换的列表
+        return paths, self.file_manager.file_names
+    
+    def _apply_scan_result(self, source_dir, result):
+        """
+        在主线程中将扫描结果更新到文件列表
+        
+        Args:
+            source_dir: 扫描的源目录
+            result: _scan_worker返回的(视频文件列表, 文件名列表)，源目录不存在时为None
+        """
+        if result is None:
+            # 清空文件列表
+            self.file_tree.delete(*self.file_tree.get_children())
+            self._tree_items = {}
+            self._basenames = []
+            self.video_files = []
             self.log_message(f"源目录不存在: {source_dir}")
             messagebox.showwarning("警告", f"源目录不存在: {source_dir}")
+            return
+        
+        files, names = result
+        if files == self.video_files:
+            # 扫描结果与当前列表相同时不重建表格，只把各行恢复为等待状态，未变化的行不会写入表格
+            for filename, item in self._tree_items.items():
+                self._set_row_status(filename, item, "等待")
+                self._set_row_progress(filename, item, "0%")
+        else:
+            self.video_files = files
+            
+            # 更新文件列表
+            self.update_file_list(names)
+        
+        self.log_message(f"扫描完成，共找到 {len(self.video_files)} 个.v264文件")
     
-    def update_file_list(self):
+    def update_file_list(self, names):
         """
         更新文件列表显示
+        
+        Args:
+            names: 与video_files一一对应的文件名列表
         """
         # 清空现有列表
         self.file_tree.delete(*self.file_tree.get_children())
-        
-        # 添加文件到列表
-        for file_path in self.video_files:
-            filename = os.path.basename(file_path)
-            self.file_tree.insert("", tk.END, values=(filename, "等待", "0%"))
+        self._tree_items = {}
+        # 文件名在扫描时由目录项得到，排序后与video_files一一对应
+        self._basenames = names
+        
+        # 添加文件到列表，同时记录文件名对应的行ID
+        for filename in self._basenames:
+            self._tree_items[filename] = self.file_tree.insert("", tk.END, values=(filename, "等待", "0%"))
+        self._row_status = dict.fromkeys(self._basenames, "等待")
+        self._last_pct = dict.fromkeys(self._basenames, "0%")
     
     def update_task_progress(self, filename, progress):
         """
-        更新任务进度
+        更新任务进度，可在任意线程中调用；进度先放入队列，由主线程统一更新界面
         
         Args:
             filename: 文件名
             progress: 进度百分比
         """
-        # 更新文件列表中的进度
-        for item in self.file_tree.get_children():
-            values = self.file_tree.item(item, "values")
-            if values[0] == filename:
-                # 更新状态为转码中
-                if values[1] != "转码中":
-                    self.file_tree.item(item, values=(filename, "转码中", f"{progress:.1f}%"))
-                else:
-                    self.file_tree.item(item, values=(filename, "转码中", f"{progress:.1f}%"))
-                break
+        self._progress_queue.put((filename, progress))
+    
+    def _on_tasks_finished(self, results):
+        """
+        任务管理器的完成回调，在工作线程中调用，排在已上报的进度之后交给主线程处理
         
-        # 更新总进度
+        Args:
+            results: 转码结果
+        """
+        self._progress_queue.put((None, (self.on_transcode_completed, (results,))))
+    
+    def _drain_progress(self):
+        """
+        在主线程中取出队列中的所有进度，每个文件只应用最新的进度，然后重新调度自身
+        """
+        # 无论本轮处理是否抛出异常都重新调度，避免进度和日志更新就此停止
+        try:
+            latest = {}
+            try:
+                while True:
+                    filename, progress = self._progress_queue.get_nowait()
+                    if filename is None:
+                        # 先应用之前的进度，避免旧进度覆盖回调写入的最终状态
+                        self._apply_progress(latest)
+                        latest = {}
+                        callback, args = progress
+                        callback(*args)
+                    else:
+                        latest[filename] = progress
+            except queue.Empty:
+                pass
+            
+            self._apply_progress(latest)
+            if self._log_buffer:
+                self._flush_log()
+        finally:
+            self.root.after(_PROGRESS_POLL_MS, self._drain_progress)
+    
+    def _apply_progress(self, latest):
+        """
+        将一批进度更新到文件列表和总进度
+        
+        Args:
+            latest: 文件名到最新进度百分比的映射
+        """
+        # 合并进度只更新合并进度条
+        merge_progress = latest.pop(_MERGE_PROGRESS_KEY, None)
+        if merge_progress is not None:
+            self.merge_progress["value"] = merge_progress
+        
+        if not latest:
+            return
+        for filename, progress in latest.items():
+            # 通过索引直接定位文件对应的行，状态只在首次进入转码中时写入，之后只更新进度一列
+            item = self._tree_items.get(filename)
+            if item is not None:
+                self._set_row_status(filename, item, "转码中")
+                self._set_row_progress(filename, item, _format_pct(round(progress, 1)))
+        
+        # 一批进度只更新一次总进度
         self.update_total_progress()
     
     def update_total_progress(self):
         """
         更新总进度
         """
-        # 获取任务管理器中的任务总数
-        total_tasks = self.task_manager.get_total_count()
-        if total_tasks == 0:
+        # 一次获取所有任务计数
+        counts = self.task_manager.get_counts()
+        if counts.total == 0:
             return
         
         # 计算总进度
-        completed_count = self.task_manager.get_completed_count()
-        failed_count = self.task_manager.get_failed_count()
-        cancelled_count = self.task_manager.get_cancelled_count()
-        total_count = total_tasks
+        finished_count = counts.completed + counts.failed + counts.cancelled
         
         # 更新进度条
-        progress = (completed_count + failed_count + cancelled_count) / total_count * 100
-        self.total_progress["value"] = progress
+        self.total_progress["value"] = finished_count / counts.total * 100
         
         # 更新进度标签
-        self.progress_label.config(text=f"{completed_count + failed_count + cancelled_count}/{total_count} 个文件")
+        self.progress_label.config(text=f"{finished_count}/{counts.total} 个文件")
     
     def start_transcode(self):
         """
@@ -302,22 +498,21 @@ class MainWindow:
             messagebox.showwarning("警告", "请先选择要转码的文件")
             return
         
-        # 获取选中的文件名列表
-        selected_filenames = []
-        for item in selected_items:
-            values = self.file_tree.item(item, "values")
-            selected_filenames.append(values[0])
+        # 获取选中的文件名集合，只读取文件名一列
+        selected_filenames = {self.file_tree.set(item, "filename") for item in selected_items}
         
-        # 筛选出选中的视频文件
-        selected_video_files = []
-        for file_path in self.video_files:
-            filename = os.path.basename(file_path)
-            if filename in selected_filenames:
-                selected_video_files.append(file_path)
+        # 筛选出选中的视频文件，文件名已在扫描时计算
+        selected_video_files = [
+            file_path for file_path, filename in zip(self.video_files, self._basenames)
+            if filename in selected_filenames
+        ]
         
         # 保存选中的文件数量，用于进度计算
         self.selected_video_files_count = len(selected_video_files)
         
+        # 开始转码前确保配置已写入磁盘
+        self.config_manager.flush()
+        
         # 清空之前的任务
         self.task_manager.clear_tasks()
         
@@ -325,32 +520,36 @@ class MainWindow:
         source_dir = self.source_dir.get()
         output_dir = self.config_manager.get_output_dir(source_dir)
         
-        if self.merge_videos.get():
+        if self.merge_videos_var.get():
             # 合并视频模式
             self.log_message("开始转码并合并视频...")
+            self.merge_progress["value"] = 0
             
             # 第一步：将选中的v264文件转码为mp4文件
-            temp_mp4_files = []
             include_audio = self.include_audio.get()
-            for input_file in selected_video_files:
-                output_file = self.transcode_engine.get_output_filename(input_file, output_dir)
-                temp_mp4_files.append(output_file)
-                self.task_manager.add_task(input_file, output_file, include_audio)
+            self.task_manager.add_tasks(
+                {
+                    "input_file": input_file,
+                    "output_file": self.transcode_engine.get_output_filename(input_file, output_dir),
+                    "include_audio": include_audio,
+                }
+                for input_file in selected_video_files
+            )
             
-            # 第二步：转码完成后合并视频
+            # 第二步：转码完成后合并视频；该回调在任务管理器的工作线程中执行，
+            # 只进行合并和清理临时文件，界面更新经进度队列交给主线程
             def on_merge_completed(results):
                 # 获取成功转码的文件
-                completed_tasks = [task for task in self.task_manager.get_all_tasks() if task["status"] == "completed"]
+                completed_tasks = [task for task in self.task_manager.get_all_tasks() if task.status == "completed"]
                 if completed_tasks:
                     # 只合并成功转码的文件
-                    successful_mp4_files = [task["output_file"] for task in completed_tasks]
+                    successful_mp4_files = [task.output_file for task in completed_tasks]
                     self.log_message(f"开始合并 {len(successful_mp4_files)} 个成功转码的视频...")
                     # 生成合并后的输出文件名
                     merged_output = self.transcode_engine.get_merged_output_filename(output_dir)
-                    # 执行合并操作
-                    success = self.merge_videos(successful_mp4_files, merged_output)
+                    # 执行合并操作，成功或失败由merge_videos记录日志
+                    success = self.merge_videos(successful_mp4_files, merged_output, include_audio)
                     if success:
-                        self.log_message(f"视频合并成功: {merged_output}")
                         # 删除临时文件
                         for temp_file in successful_mp4_files:
                             if os.path.exists(temp_file):
@@ -359,29 +558,13 @@ class MainWindow:
                                     self.log_message(f"已删除临时文件: {temp_file}")
                                 except Exception as e:
                                     self.log_message(f"删除临时文件失败: {temp_file}, {str(e)}")
-                    else:
-                        self.log_message(f"视频合并失败: {merged_output}")
                 else:
                     self.log_message("没有成功转码的视频文件，无法合并")
                 
-                # 恢复原始的完成回调
-                self.task_manager.set_completion_callback(original_completion_callback)
-                
-                # 恢复按钮状态
-                self.start_btn.config(state=tk.NORMAL)
-                self.pause_btn.config(state=tk.DISABLED)
-                self.resume_btn.config(state=tk.DISABLED)
-                self.cancel_btn.config(state=tk.DISABLED)
-                self.retry_btn.config(state=tk.NORMAL)
-                
-                # 显示完成通知
-                completed_count = self.task_manager.get_completed_count()
-                failed_count = self.task_manager.get_failed_count()
-                cancelled_count = self.task_manager.get_cancelled_count()
-                total_count = len(selected_video_files)
-                
-                self.log_message(f"转码完成: {completed_count} 个成功, {failed_count} 个失败, {cancelled_count} 个取消")
-                messagebox.showinfo("转码完成", f"转码完成: {completed_count} 个成功, {failed_count} 个失败, {cancelled_count} 个取消")
+                # 排在已上报的进度之后交给主线程恢复完成回调并更新界面
+                self._progress_queue.put(
+                    (None, (self._on_merge_finished, (results, original_completion_callback)))
+                )
             
             # 保存原始的完成回调
             original_completion_callback = self.task_manager.completion_callback
@@ -391,12 +574,16 @@ class MainWindow:
             # 普通转码模式
             self.log_message("开始转码...")
             
-            # 添加转码任务
+            # 批量添加转码任务
             include_audio = self.include_audio.get()
-            for input_file in selected_video_files:
-                # 生成输出文件名
-                output_file = self.transcode_engine.get_output_filename(input_file, output_dir)
-                self.task_manager.add_task(input_file, output_file, include_audio)
+            self.task_manager.add_tasks(
+                {
+                    "input_file": input_file,
+                    "output_file": self.transcode_engine.get_output_filename(input_file, output_dir),
+                    "include_audio": include_audio,
+                }
+                for input_file in selected_video_files
+            )
         
         # 开始转码
         self.task_manager.start()
@@ -476,65 +663,70 @@ class MainWindow:
         self.cancel_btn.config(state=tk.DISABLED)
         self.retry_btn.config(state=tk.NORMAL)
         
-        # 更新文件列表中的状态
-        for item in self.file_tree.get_children():
-            values = self.file_tree.item(item, "values")
-            filename = values[0]
-            
-            # 查找对应的任务
-            for task in self.task_manager.get_all_tasks():
-                task_filename = os.path.basename(task["input_file"])
-                if task_filename == filename:
-                    # 更新状态
-                    status = task["status"]
-                    if status == "completed":
-                        self.file_tree.item(item, values=(filename, "完成", "100%"))
-                    elif status == "failed":
-                        self.file_tree.item(item, values=(filename, "失败", "0%"))
-                    elif status == "cancelled":
-                        self.file_tree.item(item, values=(filename, "取消", f"{task['progress']:.1f}%"))
-                    break
+        # 更新文件列表中的状态，按任务的文件名直接定位对应的行
+        for task in self.task_manager.get_all_tasks():
+            item = self._tree_items.get(task.filename)
+            if item is None:
+                continue
+            status = task.status
+            if status == "completed":
+                self._set_row_status(task.filename, item, "完成")
+                self._set_row_progress(task.filename, item, "100%")
+            elif status == "failed":
+                self._set_row_status(task.filename, item, "失败")
+                self._set_row_progress(task.filename, item, "0%")
+            elif status == "cancelled":
+                self._set_row_status(task.filename, item, "取消")
+                self._set_row_progress(task.filename, item, _format_pct(round(task.progress, 1)))
         
         # 更新总进度
         self.update_total_progress()
         
         # 显示完成通知
-        completed_count = self.task_manager.get_completed_count()
-        failed_count = self.task_manager.get_failed_count()
-        cancelled_count = self.task_manager.get_cancelled_count()
+        counts = self.task_manager.get_counts()
+        completed_count, failed_count, cancelled_count = counts.completed, counts.failed, counts.cancelled
         total_count = len(self.video_files)
         
         self.log_message(f"转码完成: {completed_count} 个成功, {failed_count} 个失败, {cancelled_count} 个取消")
         messagebox.showinfo("转码完成", f"转码完成: {completed_count} 个成功, {failed_count} 个失败, {cancelled_count} 个取消")
     
-    def merge_videos(self, input_files, output_file):
+    def _on_merge_finished(self, results, original_completion_callback):
+        """
+        合并视频模式结束后在主线程中执行：恢复原始的完成回调，并按普通转码完成更新文件状态和按钮
+        
+        Args:
+            results: 转码结果
+            original_completion_callback: 合并前任务管理器的完成回调
+        """
+        self.task_manager.set_completion_callback(original_completion_callback)
+        self.on_transcode_completed(results)
+    
+    def merge_videos(self, input_files, output_file, include_audio):
         """
-        合并视频文件
+        合并视频文件，在工作线程中调用，不访问Tk变量
         
         Args:
             input_files: 输入文件列表
             output_file: 输出文件路径
+            include_audio: 是否包含音频处理，由主线程在开始转码时读取
         
         Returns:
             bool: 是否成功
         """
         try:
-            # 获取音频处理设置
-            include_audio = self.include_audio.get()
-            
-            # 调用转码引擎合并视频
-            success = self.transcode_engine.merge_videos(
+            # 调用转码引擎合并视频，合并进度通过引擎的进度回调以固定名称放入进度队列，由主线程更新合并进度条
+            success, error_msg = self.transcode_engine.merge_videos(
                 input_files, 
                 output_file, 
-                progress_callback=self.update_progress,
-                include_audio=include_audio
+                include_audio=include_audio,
+                progress_name=_MERGE_PROGRESS_KEY
             )
             
             if success:
                 self.log_message(f"视频合并成功: {output_file}")
                 return True
             else:
-                self.log_message(f"视频合并失败: {output_file}")
+                self.log_message(f"视频合并失败: {output_file}, {error_msg}")
                 return False
                 
         except Exception as e:
@@ -548,13 +740,30 @@ class MainWindow:
         Args:
             message: 日志消息
         """
-        # 获取当前时间
-        import datetime
-        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # 获取当前时间，time.strftime直接返回格式化后的字符串，无需构造datetime对象
+        current_time = time.strftime(_LOG_TIME_FORMAT)
+        
+        # 只加入缓冲区，可在任意线程中调用；由主线程的处理循环批量写入文本框
+        self._log_buffer.append(f"[{current_time}] {message}\n")
+    
+    def _flush_log(self):
+        """
+        将缓冲的日志消息一次性写入文本框
+        """
+        batch = []
+        try:
+            while True:
+                batch.append(self._log_buffer.popleft())
+        except IndexError:
+            pass
         
-        # 插入日志到文本框
+        # 整批消息只需切换一次状态、插入一次并滚动一次
         self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, f"[{current_time}] {message}\n")
+        self.log_text.insert(tk.END, "".join(batch))
+        # 超出上限时删除最早的行，避免长时间运行后文本框越来越大、重排越来越慢
+        line_count = int(self.log_text.index("end-1c").split(".")[0])
+        if line_count > _LOG_MAX_LINES:
+            self.log_text.delete("1.0", f"{line_count - _LOG_MAX_LINES}.0")
         self.log_text.see(tk.END)  # 滚动到最后一行
         self.log_text.config(state=tk.DISABLED)
     
@@ -566,8 +775,32 @@ class MainWindow:
             filename: 文件名
             status: 状态
         """
-        for item in self.file_tree.get_children():
-            values = self.file_tree.item(item, "values")
-            if values[0] == filename:
-                self.file_tree.item(item, values=(filename, status, values[2]))
-                break
\ No newline at end of file
+        item = self._tree_items.get(filename)
+        if item is not None:
+            self._set_row_status(filename, item, status)
+    
+    def _set_row_status(self, filename, item, status):
+        """
+        更新表格行的状态列，与当前显示的状态相同时跳过写入
+        
+        Args:
+            filename: 文件名
+            item: 文件对应的表格行ID
+            status: 状态
+        """
+        if self._row_status.get(filename) != status:
+            self.file_tree.set(item, "status", status)
+            self._row_status[filename] = status
+    
+    def _set_row_progress(self, filename, item, text):
+        """
+        更新表格行的进度列，与当前显示的进度文本相同时跳过写入
+        
+        Args:
+            filename: 文件名
+            item: 文件对应的表格行ID
+            text: 进度文本
+        """
+        if self._last_pct.get(filename) != text:
+            self.file_tree.set(item, "progress", text)
+            self._last_pct[filename] = text
\ No newline at end of file
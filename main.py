@@ -8,14 +8,16 @@
 import sys
 import os
 import logging
+import multiprocessing
 from tkinter import Tk
 
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # 修改导入方式，使用绝对导入
-from utils.logger import setup_logger
+from utils.logger import configure_logger_from_config, shutdown_logger
 from utils.error_handler import initialize_error_handling
+from core.config_manager import get_config_manager
 from gui.main_window import MainWindow
 
 
@@ -24,8 +26,8 @@ def main():
     主函数，启动应用程序
     """
     try:
-        # 初始化日志
-        setup_logger()
+        # 初始化日志，导入日志模块时不再自动配置，必须在其他初始化之前显式调用
+        configure_logger_from_config()
         logger = logging.getLogger(__name__)
         logger.info("视频转码工具启动")
         
@@ -53,9 +55,15 @@ def main():
         
         sys.exit(1)
     finally:
+        # 在停止日志线程之前写入未保存的配置，保存结果和失败原因才能记录到日志中
+        get_config_manager().flush()
         logger = logging.getLogger(__name__)
         logger.info("视频转码工具退出")
+        # 停止后台日志线程，确保队列中的日志全部写入文件
+        shutdown_logger()
 
 
 if __name__ == "__main__":
+    # 打包为可执行文件后，多进程转码的子进程需要通过freeze_support正确启动
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
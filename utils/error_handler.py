@@ -7,17 +7,40 @@
 
 import sys
 import os
+import shutil
+import threading
 import traceback
 import logging
+import tkinter as tk
 from tkinter import messagebox
 
-# 修改导入方式，使用绝对导入
-from core.config_manager import ConfigManager
-
 # 获取日志记录器
 logger = logging.getLogger(__name__)
 
 
+def _show_error_dialog(title, message):
+    """
+    显示错误对话框，可在任意线程中调用；不在主线程时交给主线程的事件循环显示
+    
+    Args:
+        title: 对话框标题
+        message: 错误信息
+        
+    Returns:
+        bool: 是否已显示或已安排显示对话框，Tk根窗口不存在时返回False
+    """
+    # 没有Tk根窗口时messagebox会自行创建一个隐藏的根窗口，在后台线程中可能卡死或崩溃
+    root = tk._default_root
+    if root is None:
+        return False
+    if threading.current_thread() is threading.main_thread():
+        messagebox.showerror(title, message, parent=root)
+    else:
+        # Tk只能在主线程中操作，对话框交给主线程的事件循环显示
+        root.after(0, lambda: messagebox.showerror(title, message, parent=root))
+    return True
+
+
 def handle_exception(exc_type, exc_value, exc_traceback):
     """
     全局异常处理函数
@@ -38,15 +61,13 @@ def handle_exception(exc_type, exc_value, exc_traceback):
     # 创建错误报告
     error_info = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
     
-    # 尝试显示错误对话框
+    # 尝试显示错误对话框，无法显示时至少将错误信息打印到控制台
     try:
-        messagebox.showerror(
-            "程序错误",
-            f"程序遇到了未预期的错误:\n\n{exc_value}\n\n"
-            f"详细信息已记录到日志文件中。"
-        )
-    except:
-        # 如果无法显示错误对话框，至少将错误信息打印到控制台
+        message = f"程序遇到了未预期的错误:\n\n{exc_value}\n\n详细信息已记录到日志文件中。"
+        shown = _show_error_dialog("程序错误", message)
+    except Exception:
+        shown = False
+    if not shown:
         print(f"程序错误: {exc_value}")
         print(f"详细信息: {error_info}")
 
@@ -68,23 +89,49 @@ def setup_exception_handler():
             exc_info=(args.exc_type, args.exc_value, args.exc_traceback)
         )
         
-        # 尝试显示错误对话框
+        # 尝试显示错误对话框，工作线程中的异常交给主线程显示
         try:
-            error_msg = f"线程 {args.thread.name} 遇到了未预期的错误:\n\n{args.exc_value}"
-            messagebox.showerror("线程错误", error_msg)
-        except:
+            thread_name = args.thread.name if args.thread is not None else "未知"
+            error_msg = f"线程 {thread_name} 遇到了未预期的错误:\n\n{args.exc_value}"
+            shown = _show_error_dialog("线程错误", error_msg)
+        except Exception:
+            shown = False
+        if not shown:
             print(f"线程错误: {args.exc_value}")
     
-    # 注册线程异常处理函数（Python 3.8+）
-    if hasattr(sys, 'unraisablehook'):
-        sys.unraisablehook = handle_thread_exception
-    
-    # 在Python 3.8+中，可以使用threading.excepthook
-    if hasattr(sys, 'excepthook'):
-        import threading
+    # 在Python 3.8+中，可以使用threading.excepthook处理工作线程中未捕获的异常
+    if hasattr(threading, 'excepthook'):
         threading.excepthook = handle_thread_exception
 
 
+def _app_dir():
+    """
+    获取应用程序所在目录，打包后为可执行文件所在目录，开发环境为项目根目录
+    
+    Returns:
+        str: 应用程序目录
+    """
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def find_ffmpeg():
+    """
+    查找FFmpeg可执行文件，只检查文件是否存在，不启动FFmpeg进程
+    
+    Returns:
+        str: FFmpeg可执行文件路径，未找到时返回None
+    """
+    # 优先使用应用程序目录中随发布包附带的FFmpeg，与转码引擎解析相对路径的方式一致
+    app_dir = _app_dir()
+    for name in ("ffmpeg.exe", "ffmpeg"):
+        candidate = os.path.join(app_dir, name)
+        if os.path.isfile(candidate):
+            return candidate
+    return shutil.which("ffmpeg")
+
+
 def check_dependencies():
     """
     检查应用程序依赖是否满足
@@ -94,17 +141,9 @@ def check_dependencies():
     """
     missing_deps = []
     
-    # 检查FFmpeg
-    try:
-        import subprocess
-        result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
-        if result.returncode != 0:
-            missing_deps.append("FFmpeg未正确安装或不在PATH中")
-    except FileNotFoundError:
-        # 检查本地FFmpeg
-        ffmpeg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ffmpeg.exe")
-        if not os.path.exists(ffmpeg_path):
-            missing_deps.append("FFmpeg未找到，请确保ffmpeg.exe在应用程序目录中")
+    # 检查FFmpeg，只查找可执行文件而不运行ffmpeg -version，避免启动时多创建一个进程
+    if find_ffmpeg() is None:
+        missing_deps.append("FFmpeg未找到，请确保ffmpeg.exe在应用程序目录中或FFmpeg在PATH中")
     
     # 检查其他依赖
     try:
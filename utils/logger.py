@@ -7,8 +7,22 @@
 
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# 日志格式不包含线程和进程信息，关闭后每条日志记录不再查询线程名和进程ID
+logging.logThreads = False
+logging.logProcesses = False
+
+# 所有处理器共用的格式化器
+_FORMATTER = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# 后台写日志的监听线程，由setup_logger启动，程序退出前由shutdown_logger停止
+_listener = None
 
 
 def setup_logger(log_level=logging.INFO):
@@ -25,21 +39,21 @@ def setup_logger(log_level=logging.INFO):
     logger = logging.getLogger()
     logger.setLevel(log_level)
     
-    # 清除现有的处理器，避免重复添加
+    # 清除现有的处理器，避免重复添加；重复调用时先停止之前的监听线程
+    shutdown_logger()
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
     
-    # 创建格式化器
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    # 实际输出日志的处理器，由监听线程统一调用
+    handlers = []
     
-    # 添加控制台处理器
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(log_level)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    # 添加控制台处理器，仅在连接到终端时添加；打包后的GUI程序没有控制台，stderr可能为None
+    console_stream = sys.stderr
+    if console_stream is not None and console_stream.isatty():
+        console_handler = logging.StreamHandler(console_stream)
+        console_handler.setLevel(log_level)
+        console_handler.setFormatter(_FORMATTER)
+        handlers.append(console_handler)
     
     # 确定日志文件路径
     if hasattr(sys, '_MEIPASS'):
@@ -55,21 +69,43 @@ def setup_logger(log_level=logging.INFO):
     # 创建日志目录（如果不存在）
     os.makedirs(log_dir, exist_ok=True)
     
-    # 添加文件处理器（带轮转）
+    # 添加文件处理器（带轮转），delay=True时在第一次写入日志时才打开文件
     file_handler = RotatingFileHandler(
         log_file,
         maxBytes=10*1024*1024,  # 10MB
         backupCount=5,
-        encoding='utf-8'
+        encoding='utf-8',
+        delay=True
     )
     file_handler.setLevel(log_level)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    file_handler.setFormatter(_FORMATTER)
+    handlers.append(file_handler)
+    
+    # 根日志记录器只挂队列处理器，记录日志的线程只需入队，由监听线程写文件和控制台，
+    # 转码工作线程不会阻塞在文件处理器的锁和磁盘写入上
+    global _listener
+    log_queue = queue.Queue(-1)
+    logger.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
     
     logger.info("日志系统初始化完成")
     return logger
 
 
+def shutdown_logger():
+    """
+    停止后台日志监听线程，写完队列中剩余的日志并关闭处理器，程序退出前调用
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
 def get_logger(name):
     """
     获取指定名称的日志记录器
@@ -113,13 +149,13 @@ def configure_logger_from_config():
     """
     try:
         # 延迟导入以避免循环依赖
-        from core.config_manager import ConfigManager
+        from core.config_manager import get_config_manager
         
-        # 创建配置管理器
-        config_manager = ConfigManager()
+        # 获取共享的配置管理器，主窗口随后使用同一实例，配置文件只加载一次
+        config_manager = get_config_manager()
         
         # 获取日志配置
-        log_level_str = config_manager.get_config("log_level", "INFO")
+        log_level_str = config_manager.get_config("log_level") or "INFO"
         log_file = config_manager.get_config("log_file")
         
         # 转换日志级别
@@ -136,8 +172,3 @@ def configure_logger_from_config():
         logger = setup_logger()
         logger.warning(f"从配置文件加载日志设置失败: {str(e)}")
         return logger
-
-
-# 模块级别的初始化
-if not logging.getLogger().handlers:
-    configure_logger_from_config()
\ No newline at end of file